@@ -2515,7 +2515,20 @@ class MediaCoverGenerator(_PluginBase):
             logger.info(f"图片已保存到本地: {file_path}")
         except Exception as err:
             logger.error(f"保存图片到本地失败: {str(err)}")
-        
+
+    @staticmethod
+    def __get_image_type(image_base64):
+        """
+        根据图片头部字节判断封面的实际编码格式，返回 (Content-Type, 扩展名)
+        各风格按是否带透明通道输出 WebP / PNG / JPEG，上传头和本地文件名需与之一致
+        """
+        # 前 16 个 base64 字符解码为 12 字节，足以识别 PNG、WebP 的文件头
+        header = base64.b64decode(image_base64[:16])
+        if header.startswith(b"\x89PNG"):
+            return "image/png", "png"
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "image/webp", "webp"
+        return "image/jpeg", "jpg"
 
     def __set_library_image(self, service, library, image_base64):
         """
@@ -2529,12 +2542,13 @@ class MediaCoverGenerator(_PluginBase):
             else:
                 library_id = library.get("ItemId")
             url = f'[HOST]emby/Items/{library_id}/Images/Primary?api_key=[APIKEY]'
+            content_type, extension = self.__get_image_type(image_base64)
             
             # 在发送前保存一份图片到本地
             if self._covers_output:
                 try:
                     image_bytes = base64.b64decode(image_base64)
-                    self.__save_image_to_local(image_bytes, f"{library['Name']}.jpg")
+                    self.__save_image_to_local(image_bytes, f"{library['Name']}.{extension}")
                 except Exception as save_err:
                     logger.error(f"保存发送前图片失败: {str(save_err)}")
             
@@ -2542,7 +2556,7 @@ class MediaCoverGenerator(_PluginBase):
                 url=url,
                 data=image_base64,
                 headers={
-                    "Content-Type": "image/png"
+                    "Content-Type": content_type
                 }
             )
             
@@ -2,15 +2,31 @@ import base64
 from collections import Counter
 import io
 from pathlib import Path
+import PIL
 from PIL import Image, ImageFilter, ImageDraw, ImageFont, ImageOps
 import numpy as np
 import os
 import math
 import random  # 添加随机模块
 import colorsys
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from app.log import logger
 
-""" 
+try:
+    from numba import njit
+except ImportError:
+    # numba 为可选依赖，未安装时使用 NumPy 实现
+    njit = None
+
+# Pillow-SIMD 是 Pillow 的 SSE4/AVX2 加速分支，API 完全兼容，缩放、模糊、旋转、粘贴均有数倍提速，
+# 可选安装（pip install pillow-simd 替换 pillow），其版本号带 .post 后缀，
+# 部分发行版重新打包后去掉了后缀，再检查其特有的 8bpc 水平重采样内核
+PIL_SIMD = "post" in PIL.__version__ or hasattr(Image.core, "resample_horizontal_8bpc")
+if not PIL_SIMD:
+    logger.debug(f"当前使用标准 Pillow {PIL.__version__}，安装 pillow-simd 可加快封面生成")
+
+"""
 代码修改自 https://github.com/HappyQuQu/jellyfin-library-poster/blob/main/gen_poster.py
 """
 
@@ -31,44 +47,188 @@ POSTER_GEN_CONFIG = {
     "CANVAS_HEIGHT": 1080,  # 画布高度
 }
 
-def add_shadow(img, offset=(5, 5), shadow_color=(0, 0, 0, 100), blur_radius=3):
+# 支持的图片格式
+SUPPORTED_FORMATS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+# 自定义排序顺序,如果custom_order=123456789,则代表九宫格图第一列第一行(1,1)为1.jpg，第一列第二行(1,2)为2.jpg，第一列第三行(1,3)为3.jpg,(2,1)=4.jpg以此类推，(3,3)=9.jpg
+# 这个顺序是优先把最开始的两张图1.jpg和2.jpg放在最显眼的位置(1,2)和(2,2)，而最后一个9.jpg放在看不见的位置(3,1)
+CUSTOM_ORDER = "315426987"
+ORDER_MAP = {num: index for index, num in enumerate(CUSTOM_ORDER)}
+
+def fit_image(image, size, method=Image.LANCZOS, reducing_gap=2.0):
     """
-    给图片添加右侧和底部阴影
+    居中裁剪并缩放到指定尺寸，效果同 ImageOps.fit
+
+    缩放时使用 reducing_gap，先用 BOX 快速缩小，再对较小的图像做 LANCZOS，
+    大倍数缩小时速度更快，视觉效果基本一致
+    """
+    width, height = image.size
+    output_ratio = size[0] / size[1]
+
+    # 计算居中裁剪区域
+    if width / height >= output_ratio:
+        crop_width = output_ratio * height
+        crop_height = height
+    else:
+        crop_width = width
+        crop_height = width / output_ratio
+    crop_left = (width - crop_width) * 0.5
+    crop_top = (height - crop_height) * 0.5
+    box = (crop_left, crop_top, crop_left + crop_width, crop_top + crop_height)
+
+    return image.resize(size, method, box=box, reducing_gap=reducing_gap)
+
+def create_shadow_template(size, offset=(5, 5), shadow_color=(0, 0, 0, 100), blur_radius=3, downsample=1):
+    """
+    创建已模糊的阴影模板，尺寸相同的图片可以共用同一个模板
 
     参数:
-        img: 原始图片（PIL.Image对象）
+        size: 原始图片尺寸 (width, height)
         offset: 阴影偏移量，(x, y)格式
         shadow_color: 阴影颜色，RGBA格式
         blur_radius: 阴影模糊半径
+        downsample: 缩小倍数，大于1时先在缩小的画布上以相应缩小的半径模糊，再放大回原尺寸
 
     返回:
-        添加了阴影的新图片
+        模糊后的阴影图片，比原图大一些，以容纳阴影
     """
     # 创建一个透明背景，比原图大一些，以容纳阴影
-    shadow_width = img.width + offset[0] + blur_radius * 2
-    shadow_height = img.height + offset[1] + blur_radius * 2
+    shadow_width = size[0] + offset[0] + blur_radius * 2
+    shadow_height = size[1] + offset[1] + blur_radius * 2
 
-    shadow = Image.new("RGBA", (shadow_width, shadow_height), (0, 0, 0, 0))
+    shadow = Image.new(
+        "RGBA", (shadow_width // downsample, shadow_height // downsample), (0, 0, 0, 0)
+    )
 
     # 创建阴影层
-    shadow_layer = Image.new("RGBA", img.size, shadow_color)
+    shadow_layer = Image.new(
+        "RGBA", (size[0] // downsample, size[1] // downsample), shadow_color
+    )
 
     # 将阴影层粘贴到偏移位置
-    shadow.paste(shadow_layer, (blur_radius + offset[0], blur_radius + offset[1]))
+    shadow.paste(
+        shadow_layer,
+        ((blur_radius + offset[0]) // downsample, (blur_radius + offset[1]) // downsample),
+    )
 
     # 模糊阴影
-    shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius))
+    shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius / downsample))
+    if downsample > 1:
+        # 阴影本身很柔和，放大后与直接模糊肉眼无法区分
+        shadow = shadow.resize((shadow_width, shadow_height), Image.BILINEAR)
+    return shadow
 
-    # 创建结果图像
-    result = Image.new("RGBA", shadow.size, (0, 0, 0, 0))
 
-    # 将原图粘贴到结果图像上
-    result.paste(img, (blur_radius, blur_radius), img if img.mode == "RGBA" else None)
+def _alpha_over_kernel(shadow, src, offset, dst):
+    """
+    逐像素将 src 按自身 Alpha 叠加到 shadow 的 offset 位置，乘、加、取整在一次遍历中完成。
+    """
+    height, width = shadow.shape[0], shadow.shape[1]
+    src_height, src_width = src.shape[0], src.shape[1]
+    for y in range(height):
+        sy = y - offset
+        for x in range(width):
+            sx = x - offset
+            if 0 <= sy < src_height and 0 <= sx < src_width:
+                a = src[sy, sx, 3] / 255.0
+                for c in range(3):
+                    dst[y, x, c] = int(src[sy, sx, c] * a + shadow[y, x, c] * (1.0 - a) + 0.5)
+                dst[y, x, 3] = int(255.0 * a + shadow[y, x, 3] * (1.0 - a) + 0.5)
+            else:
+                for c in range(4):
+                    dst[y, x, c] = int(shadow[y, x, c] + 0.5)
+
+# 不使用 parallel=True：本函数在 build_column 的线程池中被多个线程同时调用，
+# numba 默认的 workqueue 线程层不支持并发调用，会直接终止整个进程；并行由线程池提供
+if njit is not None:
+    _alpha_over_jit = njit(fastmath=True, cache=True)(_alpha_over_kernel)
+else:
+    _alpha_over_jit = None
+
+def composite_over_shadow(img, shadow_array, blur_radius, out):
+    """
+    将图片按自身透明度叠加到阴影模板上（图片在上层），一次 NumPy 运算完成混合
+    安装了 numba 时使用编译内核，直接输出 uint8 结果
+
+    参数:
+        img: RGBA格式的图片（PIL.Image对象）
+        shadow_array: 阴影模板的float32数组，见 create_shadow_template
+        blur_radius: 阴影模糊半径，即图片在阴影模板中的偏移
+        out: 与阴影模板同尺寸的float32缓冲区，可在多张图片之间复用
+
+    返回:
+        添加了阴影的新图片
+    """
+    if _alpha_over_jit is not None:
+        dst = np.empty(shadow_array.shape, dtype=np.uint8)
+        _alpha_over_jit(shadow_array, np.asarray(img), blur_radius, dst)
+        return Image.fromarray(dst, "RGBA")
+
+    np.copyto(out, shadow_array)
+    src = np.asarray(img, dtype=np.float32)
+    height, width = src.shape[:2]
+    region = out[blur_radius:blur_radius + height, blur_radius:blur_radius + width]
 
-    # 合并阴影和原图（保持原图在上层）
-    shadow_img = Image.alpha_composite(shadow, result)
+    alpha = src[..., 3:] / 255.0
+    region *= 1.0 - alpha
+    src[..., :3] *= alpha
+    src[..., 3:] = 255.0 * alpha
+    region += src
 
-    return shadow_img
+    out += 0.5
+    return Image.fromarray(out.astype(np.uint8), "RGBA")
+
+
+@functools.lru_cache(maxsize=8)
+def get_layout_plan(cell_width, cell_height, corner_radius, shadow_blur_radius):
+    """
+    预先计算海报布局中只与尺寸有关的部分，相同配置只计算一次
+
+    参数:
+        cell_width, cell_height: 单张海报的尺寸
+        corner_radius: 圆角半径，为0时不生成圆角遮罩
+        shadow_blur_radius: 阴影模糊半径
+
+    返回:
+        (圆角遮罩, 阴影模板的float32数组, 每列偏移) 元组，三者在调用之间共享，只读
+    """
+    # 所有海报尺寸和圆角半径相同，圆角遮罩只需创建一次（只被读取，可在线程间共享）
+    corner_mask = None
+    if corner_radius > 0:
+        corner_mask = Image.new("L", (cell_width, cell_height), 0)
+        draw = ImageDraw.Draw(corner_mask)
+        draw.rounded_rectangle(
+            [(0, 0), (cell_width, cell_height)],
+            radius=corner_radius,
+            fill=255,
+        )
+
+    # 阴影预先生成一次已模糊的模板，所有海报共用
+    shadow_template = create_shadow_template(
+        (cell_width, cell_height),
+        offset=(20, 20),  # 较大的偏移量
+        shadow_color=(0, 0, 0, 216),  # 更深的黑色，但不要超过255的透明度
+        blur_radius=shadow_blur_radius,
+        downsample=2,  # 在半尺寸上模糊，计算量约为原来的1/4
+    )
+    shadow_array = np.asarray(shadow_template, dtype=np.float32)
+    shadow_array.setflags(write=False)
+
+    # 每列相对默认位置的偏移 (dx, dy)：左侧列、中间列、右侧列
+    col_offsets = (
+        (0, 0),
+        (cell_width - 50, 0),
+        (cell_width * 2 - 40, -155),
+    )
+
+    return corner_mask, shadow_array, col_offsets
+
+
+@functools.lru_cache(maxsize=64)
+def get_font(font_path, font_size):
+    """
+    加载字体并按 (路径, 字号) 缓存，避免每次绘制都重新打开并解析字体文件
+    """
+    return ImageFont.truetype(font_path, font_size)
 
 
 # 单行文字
@@ -101,7 +261,7 @@ def draw_text_on_image(
     shadow_layer = Image.new('RGBA', img_copy.size, (0, 0, 0, 0))
     draw = ImageDraw.Draw(text_layer)
     shadow_draw = ImageDraw.Draw(shadow_layer)
-    font = ImageFont.truetype(font_path, font_size)
+    font = get_font(font_path, font_size)
     
     # 如果需要添加阴影
     if shadow:
@@ -177,7 +337,7 @@ def draw_multiline_text_on_image(
     img_copy = image.copy()
     text_layer = Image.new('RGBA', img_copy.size, (255, 255, 255, 0))
     draw = ImageDraw.Draw(text_layer)
-    font = ImageFont.truetype(font_path, font_size)
+    font = get_font(font_path, font_size)
 
     # 按空格分割文本
     lines = text.split(" ")
@@ -237,18 +397,27 @@ def draw_multiline_text_on_image(
     return img_copy, len(lines)
 
 
+def open_image(image):
+    """
+    打开图片；传入已打开的PIL.Image对象时直接返回，避免同一张图片重复解码
+    """
+    if isinstance(image, Image.Image):
+        return image
+    return Image.open(image)
+
+
 def get_random_color(image_path):
     """
     获取图片随机位置的颜色
 
     参数:
-        image_path: 图片文件路径
+        image_path: 图片文件路径，或已打开的PIL.Image对象
 
     返回:
         随机点颜色，RGBA格式
     """
     try:
-        img = Image.open(image_path)
+        img = open_image(image_path)
         # 获取图片尺寸
         width, height = img.size
 
@@ -346,35 +515,26 @@ def create_gradient_background(width, height, color=None):
         r, g, b = _normalize_rgb(input_rgb)
         lum = 0.299*r + 0.587*g + 0.114*b
         return min_lum <= lum <= max_lum
-    # 定义用于判断颜色是否合适的函数
-    def _is_mid_bright_hsl(input_rgb, min_l=0.3, max_l=0.7):
-        """
-        基于 HSL Lightness 判断。Lightness 在 [0,1]。
-        """
-        r, g, b = _normalize_rgb(input_rgb)
-        # 归一到 [0,1]
-        r1, g1, b1 = r/255.0, g/255.0, b/255.0
-        h, l, s = colorsys.rgb_to_hls(r1, g1, b1)
-        return min_l <= l <= max_l
-    
+
     selected_color = None
     
     # 如果传入的是颜色数组
     if isinstance(color, list) and len(color) > 0:
-        # 尝试找到合适的颜色，最多尝试5个
-        for i in range(min(10, len(color))):
-            if _is_mid_bright_hsl(color[i]):
-                # 如果是(color_tuple, count)格式，提取颜色元组
-                if isinstance(color[i], tuple) and len(color[i]) == 2 and isinstance(color[i][0], tuple):
-                    selected_color = color[i][0]
-                else:
-                    selected_color = color[i]
-                # logger.info(f" 海报主题色:[{selected_color}]适合做背景")
-                break
-            else:
-                pass
-                # logger.info(f" 海报主题色:[{color[i]}]不适合做背景,尝试做下一个颜色")
-    
+        # 尝试找到合适的颜色，最多尝试10个
+        candidates = color[:10]
+        # 如果是(color_tuple, count)格式，提取颜色元组
+        candidates = [
+            c[0] if isinstance(c, tuple) and len(c) == 2 and isinstance(c[0], tuple) else c
+            for c in candidates
+        ]
+        # 一次性归一化并计算所有候选色的 HSL Lightness
+        rgb_array = np.array([_normalize_rgb(c) for c in candidates], dtype=np.float64) / 255.0
+        lightness = (rgb_array.max(axis=1) + rgb_array.min(axis=1)) / 2.0
+        suitable = (lightness >= 0.3) & (lightness <= 0.7)
+        if suitable.any():
+            selected_color = candidates[int(np.argmax(suitable))]
+            # logger.info(f" 海报主题色:[{selected_color}]适合做背景")
+
     # 如果没有找到合适的颜色，随机生成一个颜色
     if selected_color is None:
 
@@ -470,7 +630,7 @@ def get_poster_primary_color(image_path):
     分析图片并提取主色调
     
     参数:
-        image_path: 图片文件路径
+        image_path: 图片文件路径，或已打开的PIL.Image对象
         
     返回:
         主色调颜色，RGBA格式
@@ -479,7 +639,7 @@ def get_poster_primary_color(image_path):
         from collections import Counter
         
         # 打开图片
-        img = Image.open(image_path)
+        img = open_image(image_path)
         
         # 缩小图片尺寸以加快处理速度
         img = img.resize((100, 150), Image.LANCZOS)
@@ -544,7 +704,7 @@ def create_blur_background(image_path, template_width, template_height, backgrou
     创建模糊背景图像，将原始图像模糊化并与指定颜色混合，添加胶片颗粒效果
     
     参数:
-        image_path (str): 原始图像的路径
+        image_path (str or PIL.Image): 原始图像的路径，或已打开的图像
         template_width (int): 模板宽度
         template_height (int): 模板高度
         color (tuple or list): 背景混合颜色列表或颜色元组，包含(R,G,B,A)格式的颜色
@@ -554,7 +714,7 @@ def create_blur_background(image_path, template_width, template_height, backgrou
     """
     
     # 加载原始图像
-    original_img = Image.open(image_path)
+    original_img = open_image(image_path)
     
     # 确保原图像有正确的模式（RGB或RGBA）
     if original_img.mode != 'RGBA':
@@ -578,88 +738,94 @@ def create_blur_background(image_path, template_width, template_height, backgrou
         # 默认颜色，以防颜色格式不正确
         bg_color = (0, 0, 0)
 
-    # 将背景图片与背景色混合
-    bg_img_array = np.array(bg_img, dtype=float)
-    height, width, channels = bg_img_array.shape
-    
-    # 创建和背景图片相同大小的颜色数组
-    bg_color_array = np.zeros_like(bg_img_array)
-    
-    # 填充RGB通道
-    for i in range(min(3, channels)):  
-        bg_color_array[:, :, i] = float(bg_color[i])
-    
-    # 如果有Alpha通道，设置为完全不透明
-    if channels == 4:
-        bg_color_array[:, :, 3] = 255.0
-    
-    # 混合背景图和颜色
-    blended_bg_array = bg_img_array * (1 - float(color_ratio)) + bg_color_array * float(color_ratio)
-    blended_bg_array = np.clip(blended_bg_array, 0, 255).astype(np.uint8)
-
-    # 转回PIL图像
-    mode = 'RGBA' if channels == 4 else 'RGB'
-    blended_bg_img = Image.fromarray(blended_bg_array, mode)
-
-    if blended_bg_img.mode != 'RGBA':
-        blended_bg_img = blended_bg_img.convert('RGBA')
-
-    # 3. 从左到右颜色变浅的渐变处理
+    # 3. 从左到右颜色变浅的渐变（每列白色叠加层的透明度）
     if lighten_gradient_strength > 0:
-        gradient_mask = Image.new("L", canvas_size, 0)  
-        draw_mask = ImageDraw.Draw(gradient_mask)
-
-        for x in range(template_width):
-            max_alpha_for_gradient = int(255 * np.clip(lighten_gradient_strength, 0.0, 1.0))
-            alpha_value = int((x / template_width) * max_alpha_for_gradient)
-            draw_mask.line([(x, 0), (x, template_height)], fill=alpha_value)
-
-        # 创建一个白色的叠加层
-        lighten_layer = Image.new("RGBA", canvas_size, (255, 255, 255, 0))
-        lighten_layer.putalpha(gradient_mask)
-
-        blended_bg_img = Image.alpha_composite(blended_bg_img, lighten_layer)
+        max_alpha_for_gradient = int(255 * np.clip(lighten_gradient_strength, 0.0, 1.0))
+        lighten_alpha = (np.arange(template_width) / template_width * max_alpha_for_gradient).astype(np.int64)
+    else:
+        lighten_alpha = np.zeros(template_width, dtype=np.int64)
 
-    # 4. 添加胶片颗粒效果
-    # 假设 add_film_grain 函数存在且正常工作
-    final_bg_img = add_film_grain(blended_bg_img, intensity=0.03)
+    # 将背景图片与背景色混合、叠加渐变并添加胶片颗粒效果，一次完成
+    final_bg_img = blend_and_grain(np.asarray(bg_img), bg_color, float(color_ratio), lighten_alpha, intensity=0.03)
 
     return final_bg_img
 
-def add_film_grain(image, intensity=0.05):
+def _blend_and_grain_kernel(blurred, out, color, ratio, lighten_alpha, noise_scale, seed):
     """
-    为图像添加胶片颗粒效果
-    
+    逐像素完成背景色混合、白色渐变叠加和胶片颗粒，只读写一次整张画布。
+    噪声使用 xorshift 随机数，四个均匀分布之和近似高斯分布。
+    """
+    height, width = blurred.shape[0], blurred.shape[1]
+    inv_ratio = 1.0 - ratio
+    for y in range(height):
+        state = (seed ^ ((y + 1) * 0x9E3779B9)) & 0xFFFFFFFF
+        if state == 0:
+            state = 1
+        for x in range(width):
+            # 混合背景色，Alpha 通道与完全不透明混合
+            blended_alpha = int(blurred[y, x, 3] * inv_ratio + 255.0 * ratio)
+            # 叠加白色渐变层（alpha_composite）
+            src_a = lighten_alpha[x] / 255.0
+            dst_a = blended_alpha / 255.0
+            out_a = src_a + dst_a * (1.0 - src_a)
+            out[y, x, 3] = int(out_a * 255.0 + 0.5)
+            for c in range(3):
+                value = float(int(blurred[y, x, c] * inv_ratio + color[c] * ratio))
+                if out_a > 0:
+                    value = (255.0 * src_a + value * dst_a * (1.0 - src_a)) / out_a
+                noise = 0.0
+                for _ in range(4):
+                    state ^= (state << 13) & 0xFFFFFFFF
+                    state ^= state >> 17
+                    state ^= (state << 5) & 0xFFFFFFFF
+                    noise += state / 4294967296.0
+                value += (noise - 2.0) * 1.7320508075688772 * noise_scale
+                if value < 0.0:
+                    value = 0.0
+                elif value > 255.0:
+                    value = 255.0
+                out[y, x, c] = int(value)
+
+# 同样不使用 parallel=True：定时任务与入库事件可能同时生成封面，并发进入 workqueue 线程层的并行内核会终止进程
+if njit is not None:
+    _blend_and_grain_jit = njit(fastmath=True, cache=True)(_blend_and_grain_kernel)
+else:
+    _blend_and_grain_jit = None
+
+def blend_and_grain(bg_array, bg_color, color_ratio, lighten_alpha, intensity=0.03):
+    """
+    将模糊背景与背景色混合，叠加从左到右的白色渐变，并只对RGB通道添加胶片颗粒
+
     参数:
-        image (PIL.Image): 输入图像
+        bg_array (np.ndarray): 模糊后的背景，RGBA格式的uint8数组
+        bg_color (tuple): 背景混合颜色，RGB格式
+        color_ratio (float): 背景色所占比例
+        lighten_alpha (np.ndarray): 每一列白色叠加层的透明度(0-255)
         intensity (float): 颗粒强度，范围从0到1
-    
+
     返回:
-        PIL.Image: 添加颗粒效果后的图像
+        PIL.Image: 处理后的RGBA图像
     """
-    # 获取图像模式
-    mode = image.mode
-    
-    # 转换为numpy数组
-    img_array = np.array(image, dtype=np.float32)
-    
-    # 确定通道数
-    if mode == 'RGBA':
-        # 只对RGB通道添加噪声
-        channels = img_array.shape[2]
-        for i in range(min(3, channels)):  # 只处理RGB通道
-            channel = img_array[:, :, i]
-            noise = np.random.normal(0, 255 * intensity, channel.shape)
-            img_array[:, :, i] = np.clip(channel + noise, 0, 255)
-    else:
-        # RGB或其他模式
-        noise = np.random.normal(0, 255 * intensity, img_array.shape)
-        img_array = np.clip(img_array + noise, 0, 255)
-    
-    # 转换回PIL图像
-    grainy_image = Image.fromarray(img_array.astype(np.uint8), mode)
-    
-    return grainy_image
+    if _blend_and_grain_jit is not None:
+        out = np.empty_like(bg_array)
+        seed = int(np.random.randint(1, 2 ** 31))
+        _blend_and_grain_jit(bg_array, out, np.asarray(bg_color, dtype=np.float64), color_ratio,
+                             lighten_alpha, 255.0 * intensity, seed)
+        return Image.fromarray(out, 'RGBA')
+
+    color = np.array([bg_color[0], bg_color[1], bg_color[2], 255.0], dtype=np.float32)
+    blended = np.trunc(bg_array.astype(np.float32) * (1.0 - color_ratio) + color * color_ratio)
+    src_a = (lighten_alpha / 255.0).astype(np.float32)[None, :, None]
+    dst_a = blended[..., 3:] / 255.0
+    out_a = src_a + dst_a * (1.0 - src_a)
+    rgb = (255.0 * src_a + blended[..., :3] * dst_a * (1.0 - src_a)) / np.where(out_a > 0, out_a, 1.0)
+    rgb += np.random.normal(0, 255 * intensity, rgb.shape)
+
+    out = np.empty(bg_array.shape, dtype=np.uint8)
+    np.clip(rgb, 0, 255, out=rgb)
+    out[..., :3] = rgb
+    out[..., 3] = (out_a[..., 0] * 255.0 + 0.5).astype(np.uint8)
+    return Image.fromarray(out, 'RGBA')
 
 def is_not_black_white_gray_near(color, threshold=20):
     """判断颜色既不是黑、白、灰，也不是接近黑、白。"""
@@ -688,12 +854,54 @@ def adjust_to_macaron(h, s, v, target_saturation_range=(0.2, 0.7), target_value_
     adjusted_v = min(max(v, target_value_range[0]), target_value_range[1])
     return adjusted_s, adjusted_v
 
+def rgb_array_to_hsv(rgb):
+    """将 (N,3) 的 RGB 数组批量转换为 HSV，结果与 colorsys.rgb_to_hsv 一致。"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    delta = maxc - minc
+    safe_delta = np.where(delta > 0, delta, 1.0)
+    s = np.where(maxc > 0, delta / np.where(maxc > 0, maxc, 1.0), 0.0)
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.select(
+        [r == maxc, g == maxc],
+        [bc - gc, 2.0 + rc - bc],
+        default=4.0 + gc - rc,
+    )
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return h, s, maxc
+
+def hsv_array_to_rgb(h, s, v):
+    """将 HSV 数组批量转换为 (N,3) 的 uint8 RGB 数组，结果与 hsv_to_rgb 一致。"""
+    i = (h * 6.0).astype(np.int64)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    # 按扇区 i 依次取 (r, g, b) 分量
+    candidates = np.stack([v, q, p, t], axis=1)
+    sector_index = np.array([
+        [0, 3, 2],
+        [1, 0, 2],
+        [2, 0, 3],
+        [2, 1, 0],
+        [3, 2, 0],
+        [0, 2, 1],
+    ])[i]
+    rgb = np.take_along_axis(candidates, sector_index, axis=1)
+    rgb = np.where((s == 0)[:, None], v[:, None], rgb)
+    return (rgb * 255).astype(np.uint8)
+
 def find_dominant_vibrant_colors(image, num_colors=5):
     """
     从图像中提取出现次数较多的前 N 种非黑非白非灰的颜色，
     并将其调整到接近马卡龙色系。
     """
-    img = image.copy()  
+    img = image.copy()
     img.thumbnail((100, 100))
     img = img.convert('RGB')
     pixels = list(img.getdata())
@@ -703,21 +911,23 @@ def find_dominant_vibrant_colors(image, num_colors=5):
     color_counter = Counter(filtered_pixels)
     dominant_colors = color_counter.most_common(num_colors * 3) # 提取更多候选
 
-    macaron_colors = []
-    seen_hues = set() # 避免提取过于相似的颜色
-
-    for color, count in dominant_colors:
-        h, s, v = rgb_to_hsv(color)
-        adjusted_s, adjusted_v = adjust_to_macaron(h, s, v)
-        adjusted_rgb = hsv_to_rgb(h, adjusted_s, adjusted_v)
-
-        # 可以加入一些色调的判断，例如避免过于接近的色调
-        hue_degree = int(h * 360)
-        is_similar_hue = any(abs(hue_degree - seen) < 15 for seen in seen_hues) # 15度范围内的色调认为是相似的
+    # 批量完成 HSV 转换与马卡龙色调整
+    top_rgb = np.array([color for color, count in dominant_colors], dtype=np.uint8)
+    h, s, v = rgb_array_to_hsv(top_rgb)
+    adjusted_rgb = hsv_array_to_rgb(h, np.clip(s, 0.2, 0.7), np.clip(v, 0.55, 0.85))
+    hue_degrees = (h * 360).astype(np.int64)
+    # 打包成 24 位整数，便于判断颜色是否重复
+    color_keys = (adjusted_rgb[:, 0].astype(np.int64) << 16) | (adjusted_rgb[:, 1].astype(np.int64) << 8) | adjusted_rgb[:, 2]
 
-        if not is_similar_hue and adjusted_rgb not in macaron_colors:
-            macaron_colors.append(adjusted_rgb)
-            seen_hues.add(hue_degree)
+    macaron_colors = []
+    seen_keys = []
+    blocked_hues = np.zeros(360, dtype=bool) # 避免提取过于相似的颜色，15度范围内的色调认为是相似的
+
+    for hue_degree, color_key, rgb in zip(hue_degrees.tolist(), color_keys.tolist(), adjusted_rgb.tolist()):
+        if not blocked_hues[hue_degree] and color_key not in seen_keys:
+            macaron_colors.append(tuple(rgb))
+            seen_keys.append(color_key)
+            blocked_hues[max(0, hue_degree - 14):hue_degree + 15] = True
             if len(macaron_colors) >= num_colors:
                 break
 
@@ -731,19 +941,6 @@ def darken_color(color, factor=0.7):
     return (int(r * factor), int(g * factor), int(b * factor))
 
 
-def add_film_grain(image, intensity=0.05):
-    """添加胶片颗粒效果"""
-    img_array = np.array(image)
-    
-    # 创建随机噪点
-    noise = np.random.normal(0, intensity * 255, img_array.shape)
-    
-    # 应用噪点
-    img_array = img_array + noise
-    img_array = np.clip(img_array, 0, 255).astype(np.uint8)
-    
-    return Image.fromarray(img_array)
-
 def get_text_vertical_position(draw, text, font, rect_y, rect_height, text_height):
     """
     获取文本的精确垂直位置，确保在矩形内垂直居中
@@ -1026,8 +1223,10 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
         template_width = POSTER_GEN_CONFIG["CANVAS_WIDTH"]
         template_height = POSTER_GEN_CONFIG["CANVAS_HEIGHT"]
 
-        # 加载首图并处理
-        color_img = Image.open(first_image_path).convert("RGB")        
+        # 加载首图并处理，首图只解码一次，供取色和背景生成共用
+        first_image = Image.open(first_image_path)
+        first_image.load()
+        color_img = first_image.convert("RGB")
         # 获取前景图中最鲜明的颜色
         vibrant_colors = find_dominant_vibrant_colors(color_img)
         
@@ -1046,11 +1245,11 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
         else:
             blur_color = random.choice(soft_colors) # 默认橙色
 
-        gradient_color = get_poster_primary_color(first_image_path)
+        gradient_color = get_poster_primary_color(first_image)
 
         # 创建渐变背景作为模板
         if is_blur:
-          colored_bg_img = create_blur_background(first_image_path, template_width, template_height, blur_color, blur_size, color_ratio)
+          colored_bg_img = create_blur_background(first_image, template_width, template_height, blur_color, blur_size, color_ratio)
         else:
           colored_bg_img = create_gradient_background(template_width, template_height, gradient_color)
 
@@ -1062,25 +1261,18 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
         # if save_columns and not os.path.exists(columns_dir):
         #     os.makedirs(columns_dir)
 
-        # 支持的图片格式
-        supported_formats = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
-        # 自定义排序顺序,如果custom_order=123456789,则代表九宫格图第一列第一行(1,1)为1.jpg，第一列第二行(1,2)为2.jpg，第一列第三行(1,3)为3.jpg,(2,1)=4.jpg以此类推，(3,3)=9.jpg
-        custom_order = "315426987"
-        # 这个顺序是优先把最开始的两张图1.jpg和2.jpg放在最显眼的位置(1,2)和(2,2)，而最后一个9.jpg放在看不见的位置(3,1)
-        order_map = {num: index for index, num in enumerate(custom_order)}
-
-        # 获取并排序图片
-        poster_files = sorted(
-            [
-                os.path.join(poster_folder, f)
-                for f in os.listdir(poster_folder)
-                if os.path.isfile(os.path.join(poster_folder, f))
-                and f.lower().endswith(supported_formats)
-                and os.path.splitext(f)[0]
-                in order_map  # 文件名（不含扩展名）必须在自定义顺序里
-            ],
-            key=lambda x: order_map[os.path.splitext(os.path.basename(x))[0]],
-        )
+        # 获取并排序图片，scandir 的目录项自带文件类型信息，无需对每个文件再 stat 一次
+        poster_entries = []
+        with os.scandir(poster_folder) as it:
+            for entry in it:
+                if not entry.name.lower().endswith(SUPPORTED_FORMATS):
+                    continue
+                stem = os.path.splitext(entry.name)[0]
+                # 文件名（不含扩展名）必须在自定义顺序里
+                if stem in ORDER_MAP and entry.is_file():
+                    poster_entries.append((ORDER_MAP[stem], entry.path))
+        poster_entries.sort(key=lambda item: item[0])
+        poster_files = [path for _, path in poster_entries]
 
         # 确保至少有一张图片
         if not poster_files:
@@ -1100,13 +1292,16 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
             poster_files[i : i + rows] for i in range(0, len(poster_files), rows)
         ]
 
-        # 以渐变背景作为起点
-        result = colored_bg_img.copy()
-        # 处理每一组（每一列）图片
-        for col_index, column_posters in enumerate(grouped_posters):
-            if col_index >= cols:
-                break
+        # 圆角遮罩、阴影模板和每列偏移只与海报尺寸有关，按尺寸缓存，重复生成封面时直接复用
+        shadow_blur_radius = 20  # 保持模糊半径
+        corner_mask, shadow_array, col_offsets = get_layout_plan(
+            cell_width, cell_height, corner_radius, shadow_blur_radius
+        )
 
+        decoded_posters = {}
+
+        # 处理单列图片：解码、缩放、圆角、阴影、旋转，不修改 result
+        def build_column(col_index, column_posters):
             # 计算当前列的 x 坐标
             column_x = start_x + col_index * column_spacing
 
@@ -1123,55 +1318,38 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
                 (cell_width + shadow_extra_width, column_height + shadow_extra_height),
                 (0, 0, 0, 0),
             )
+            # 阴影叠加使用的缓冲区，在本列的海报之间复用
+            shadow_buffer = np.empty_like(shadow_array)
 
             # 在列画布上放置每张图片
             for row_index, poster_path in enumerate(column_posters):
                 try:
                     # 打开海报
                     poster = Image.open(poster_path)
+                    if poster_path == poster_files[0]:
+                        # 保留首张海报的解码结果，取随机点颜色时复用
+                        decoded_posters[poster_path] = poster
+                    # JPEG 解码时直接按 1/2、1/4、1/8 缩小，保留两倍余量供后续 LANCZOS 缩放
+                    if poster.format == "JPEG":
+                        poster.draft("RGB", (cell_width * 2, cell_height * 2))
 
                     # 调整海报大小为固定尺寸
-                    # resized_poster = poster.resize(
-                    #     (cell_width, cell_height), Image.LANCZOS
-                    # )
-                    resized_poster = ImageOps.fit(poster, (cell_width, cell_height), method=Image.LANCZOS)
-
-                    # 创建圆角遮罩（如果需要）
-                    if corner_radius > 0:
-                        # 创建一个透明的遮罩
-                        mask = Image.new("L", (cell_width, cell_height), 0)
-
-                        # 绘制圆角
-                        draw = ImageDraw.Draw(mask)
-                        draw.rounded_rectangle(
-                            [(0, 0), (cell_width, cell_height)],
-                            radius=corner_radius,
-                            fill=255,
-                        )
-
-                        # 应用遮罩
-                        poster_with_corners = Image.new(
-                            "RGBA", resized_poster.size, (0, 0, 0, 0)
-                        )
-                        poster_with_corners.paste(resized_poster, (0, 0), mask)
-                        resized_poster = poster_with_corners
+                    resized_poster = fit_image(poster, (cell_width, cell_height))
+                    # 统一转换为 RGBA，避免后续 paste/alpha_composite 内部再做隐式模式转换
+                    if resized_poster.mode != "RGBA":
+                        resized_poster = resized_poster.convert("RGBA")
+
+                    # 应用圆角遮罩（如果需要）
+                    if corner_mask is not None:
+                        resized_poster.putalpha(corner_mask)
 
                     # 添加阴影效果到每张海报
-                    resized_poster_with_shadow = add_shadow(
-                        resized_poster,
-                        offset=(20, 20),  # 较大的偏移量
-                        shadow_color=(
-                            0,
-                            0,
-                            0,
-                            216,
-                        ),  # 更深的黑色，但不要超过255的透明度
-                        blur_radius=20,  # 保持模糊半径
+                    resized_poster_with_shadow = composite_over_shadow(
+                        resized_poster, shadow_array, shadow_blur_radius, shadow_buffer
                     )
 
                     # 计算在列画布上的位置（垂直排列）
                     y_position = row_index * (cell_height + margin)
-                    x_position = 0  # 一般为0，但在有阴影时可能需要调整
 
                     # 粘贴到列画布上时，不要减去偏移量，确保阴影有空间
                     column_image.paste(
@@ -1184,71 +1362,49 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
                     # logger.error(f"处理图片 {os.path.basename(poster_path)} 时出错: {e}")
                     continue
 
-            # 保存原始列图像（旋转前）
-            # if save_columns:
-            #     column_orig_path = os.path.join(
-            #         columns_dir, f"{name}_column_{col_index+1}_original.png"
-            #     )
-            #     column_image.save(column_orig_path)
-            #     # logger.debug(
-            #         f"已保存原始列图像到: {column_orig_path}"
-            #     )
-
-            # 现在我们有了完整的一列图片，准备旋转它
-            # 创建一个足够大的画布来容纳旋转后的列
-            rotation_canvas_size = int(
-                math.sqrt(
-                    (cell_width + shadow_extra_width) ** 2
-                    + (column_height + shadow_extra_height) ** 2
-                )
-                * 1.5
-            )
-            rotation_canvas = Image.new(
-                "RGBA", (rotation_canvas_size, rotation_canvas_size), (0, 0, 0, 0)
-            )
-
-            # 将列图片放在旋转画布的中央
-            paste_x = (rotation_canvas_size - cell_width) // 2
-            paste_y = (rotation_canvas_size - column_height) // 2
-            rotation_canvas.paste(column_image, (paste_x, paste_y), column_image)
-
-            # 旋转整个列
-            rotated_column = rotation_canvas.rotate(
+            # 现在我们有了完整的一列图片，直接旋转整个列，expand=True 会自动计算所需画布大小
+            # 旋转角度较小时 Pillow 的仿射变换基本按行顺序读取源图，分块旋转实测没有收益，这里保持整列旋转
+            rotated_column = column_image.rotate(
                 rotation_angle, Image.BICUBIC, expand=True
             )
 
-            # 保存旋转后的列图像
-            # if save_columns:
-            #     column_rotated_path = os.path.join(
-            #         columns_dir, f"column_{col_index+1}_rotated.png"
-            #     )
-            #     rotated_column.save(column_rotated_path)
-            #     # logger.debug(
-            #         f"已保存旋转后的列图像到: {column_rotated_path}"
-            #     )
+            # 列画布右侧和底部预留了阴影空间，海报列中心相对列画布中心偏移了一半的阴影空间
+            # 旋转后该偏移也随之旋转，放置时需要扣除
+            angle_rad = math.radians(rotation_angle)
+            offset_x = -shadow_extra_width / 2
+            offset_y = -shadow_extra_height / 2
+            rotated_offset_x = offset_x * math.cos(angle_rad) + offset_y * math.sin(angle_rad)
+            rotated_offset_y = -offset_x * math.sin(angle_rad) + offset_y * math.cos(angle_rad)
 
             # 计算列在模板上的位置（不同的列有不同的y起点）
             column_center_y = start_y + column_height // 2
             column_center_x = column_x
 
             # 根据列索引调整位置
-            if col_index == 1:  # 中间列
-                column_center_x += cell_width - 50
-            elif col_index == 2:  # 右侧列
-                column_center_y += -155
-                column_center_x += (cell_width) * 2 - 40
+            dx, dy = col_offsets[col_index] if col_index < len(col_offsets) else (0, 0)
+            column_center_x += dx
+            column_center_y += dy
 
             # 计算最终放置位置
-            final_x = column_center_x - rotated_column.width // 2 + cell_width // 2
-            final_y = column_center_y - rotated_column.height // 2
-
-            # 粘贴旋转后的列到结果图像
-            result.paste(rotated_column, (final_x, final_y), rotated_column)
+            final_x = column_center_x - round(rotated_column.width / 2 + rotated_offset_x) + cell_width // 2
+            final_y = column_center_y - round(rotated_column.height / 2 + rotated_offset_y)
+
+            return final_x, final_y, rotated_column
+
+        # 以渐变背景作为起点，背景图为本次新建的临时图像，直接在其上绘制，无需复制
+        result = colored_bg_img
+        # 各列互不依赖，并行处理（Pillow 的缩放/模糊/旋转会释放 GIL）
+        # 列之间有重叠，按列顺序粘贴到结果图像以保持层叠顺序
+        grouped_posters = grouped_posters[:cols]
+        with ThreadPoolExecutor(max_workers=max(1, len(grouped_posters))) as executor:
+            for final_x, final_y, rotated_column in executor.map(
+                build_column, range(len(grouped_posters)), grouped_posters
+            ):
+                result.paste(rotated_column, (final_x, final_y), rotated_column)
 
         # 获取第一张图片的随机点颜色
         if poster_files:
-            first_image_path = poster_files[0]
-            random_color = get_random_color(first_image_path)
+            random_color = get_random_color(decoded_posters.get(poster_files[0], poster_files[0]))
         else:
             # 如果没有图片，生成一个随机颜色
             random_color = (
@@ -1333,30 +1489,42 @@ def create_style_multi_1(library_dir, title, font_path, font_size=(1,1), is_blur
             )
             
         # 保存结果
-        def image_to_base64(image, format="auto", quality=85):
+        def image_to_base64(image, format="auto", quality=85, alpha_quality=90):
             buffer = io.BytesIO()
+
+            def encode():
+                # 直接基于缓冲区视图编码，避免 getvalue 复制
+                return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
             if format.lower() == "auto":
                 if image.mode == "RGBA" or (image.info.get('transparency') is not None):
-                    format = "PNG"
+                    # 带透明通道时优先使用有损 WebP（含 alpha），体积和编码耗时都远小于 PNG
+                    # 上传时 __set_library_image 按文件头设置 Content-Type 和本地文件扩展名
+                    try:
+                        image.save(buffer, format="WEBP", quality=quality, alpha_quality=alpha_quality, method=4)
+                        return encode()
+                    except Exception:
+                        buffer.seek(0)
+                        buffer.truncate()
+                        format = "PNG" # Fallback to PNG if WebP fails
                 else:
                     try:
                         image.save(buffer, format="WEBP", quality=quality, optimize=True)
-                        base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                        return base64_str
+                        return encode()
                     except Exception:
+                        buffer.seek(0)
+                        buffer.truncate()
                         format = "JPEG" # Fallback to JPEG if WebP fails
             if format.lower() == "png":
                 image.save(buffer, format="PNG", optimize=True)
-                base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return base64_str
+                return encode()
             elif format.lower() == "jpeg":
                 image = image.convert("RGB") # Ensure RGB for JPEG
                 image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
-                base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return base64_str
+                return encode()
             else:
                 raise ValueError(f"Unsupported format: {format}")
-            
+
         return image_to_base64(result)
 
     except Exception as e:
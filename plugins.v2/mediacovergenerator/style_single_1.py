@@ -1,18 +1,24 @@
 import base64
 import random
 import colorsys
+import functools
 import math
 import os
-from collections import Counter
 from io import BytesIO
 from pathlib import Path
 from typing import Tuple, Optional
 
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps, ImageEnhance
+from PIL import Image, ImageColor, ImageDraw, ImageFilter, ImageFont, ImageOps, ImageEnhance
 
 from app.log import logger
 
+try:
+    from numba import njit
+except ImportError:
+    # numba 为可选依赖，未安装时使用 NumPy 实现
+    njit = None
+
 
 # ========== 配置 ==========
 canvas_size = (1920, 1080)
@@ -76,6 +82,111 @@ def color_distance(color1, color2):
     # 综合距离，给予色调更高的权重
     return h_dist * 5 + abs(s1 - s2) + abs(v1 - v2)
 
+def rgb_array_to_hsv(rgb):
+    """将 (N,3) 的 RGB 数组批量转换为 HSV，结果与 colorsys.rgb_to_hsv 一致。"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    delta = maxc - minc
+    safe_delta = np.where(delta > 0, delta, 1.0)
+    s = np.where(maxc > 0, delta / np.where(maxc > 0, maxc, 1.0), 0.0)
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.select(
+        [r == maxc, g == maxc],
+        [bc - gc, 2.0 + rc - bc],
+        default=4.0 + gc - rc,
+    )
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return h, s, maxc
+
+def hsv_array_to_rgb(h, s, v):
+    """将 HSV 数组批量转换为 (N,3) 的 uint8 RGB 数组，结果与 hsv_to_rgb 一致。"""
+    i = (h * 6.0).astype(np.int64)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    # 按扇区 i 依次取 (r, g, b) 分量
+    candidates = np.stack([v, q, p, t], axis=1)
+    sector_index = np.array([
+        [0, 3, 2],
+        [1, 0, 2],
+        [2, 0, 3],
+        [2, 1, 0],
+        [3, 2, 0],
+        [0, 2, 1],
+    ])[i]
+    rgb = np.take_along_axis(candidates, sector_index, axis=1)
+    rgb = np.where((s == 0)[:, None], v[:, None], rgb)
+    return (rgb * 255).astype(np.uint8)
+
+def adjust_colors_macaron(colors):
+    """批量版本的 adjust_color_macaron，输入输出均为 (N,3) 的 RGB 数组"""
+    h, s, v = rgb_array_to_hsv(colors)
+    return hsv_array_to_rgb(h, np.clip(s, 0.3, 0.7), np.clip(v, 0.6, 0.85))
+
+def color_distance_matrix(colors1, colors2):
+    """批量版本的 color_distance，返回 (N,M) 的距离矩阵"""
+    h1, s1, v1 = rgb_array_to_hsv(colors1)
+    h2, s2, v2 = rgb_array_to_hsv(colors2)
+
+    # 色调在环形空间中，需要特殊处理
+    h_diff = np.abs(h1[:, None] - h2[None, :])
+    h_dist = np.minimum(h_diff, 1 - h_diff)
+
+    # 综合距离，给予色调更高的权重
+    return h_dist * 5 + np.abs(s1[:, None] - s2[None, :]) + np.abs(v1[:, None] - v2[None, :])
+
+def _count_color_bins_kernel(pixels, threshold, gray_diff_threshold, counts):
+    """
+    逐像素完成黑白灰过滤、量化和计数，只遍历一次像素。
+    """
+    for i in range(pixels.shape[0]):
+        r, g, b = int(pixels[i, 0]), int(pixels[i, 1]), int(pixels[i, 2])
+        if r < threshold and g < threshold and b < threshold:
+            continue
+        if r > 255 - threshold and g > 255 - threshold and b > 255 - threshold:
+            continue
+        if abs(r - g) < gray_diff_threshold and abs(g - b) < gray_diff_threshold and abs(r - b) < gray_diff_threshold:
+            continue
+        counts[((r >> 3) << 10) | ((g >> 3) << 5) | (b >> 3)] += 1
+
+if njit is not None:
+    _count_color_bins_jit = njit(cache=True)(_count_color_bins_kernel)
+else:
+    _count_color_bins_jit = None
+
+def count_color_bins(pixels, threshold=20, gray_diff_threshold=10):
+    """
+    过滤掉黑白灰颜色（与 is_not_black_white_gray_near 判断一致），
+    并将剩余颜色每个通道量化到 5 位（32x32x32 个色块）计数，相近的颜色合并计数
+
+    Args:
+        pixels: (N,3) 的 uint8 RGB 数组
+        threshold: 接近黑、白的阈值
+        gray_diff_threshold: 判断为灰色的通道差阈值
+
+    Returns:
+        长度为 32768 的计数数组，下标为 (r>>3)<<10 | (g>>3)<<5 | (b>>3)
+    """
+    if _count_color_bins_jit is not None:
+        counts = np.zeros(32768, dtype=np.int64)
+        _count_color_bins_jit(pixels, threshold, gray_diff_threshold, counts)
+        return counts
+
+    pixels = pixels.astype(np.int16)
+    r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+    near_black = (pixels < threshold).all(axis=1)
+    near_white = (pixels > 255 - threshold).all(axis=1)
+    gray = (np.abs(r - g) < gray_diff_threshold) & (np.abs(g - b) < gray_diff_threshold) & (np.abs(r - b) < gray_diff_threshold)
+    quantized = (pixels[~(near_black | near_white | gray)] >> 3).astype(np.int32)
+    bins = (quantized[:, 0] << 10) | (quantized[:, 1] << 5) | quantized[:, 2]
+    return np.bincount(bins, minlength=32768)
+
 def find_dominant_macaron_colors(image, num_colors=5):
     """
     从图像中提取主要颜色并调整为马卡龙风格：
@@ -84,35 +195,38 @@ def find_dominant_macaron_colors(image, num_colors=5):
     3. 调整这些颜色使其接近马卡龙风格
     4. 确保提取的颜色之间有足够的差异
     """
-    # 缩小图片以提高效率
-    img = image.copy()
-    img.thumbnail((150, 150))
+    # 缩小图片以提高效率：统计颜色不需要高质量缩放，reduce 按整数倍做区域平均，且不会复制原图
+    factor = math.ceil(max(image.size) / 150)
+    img = image.reduce(factor) if factor > 1 else image
     img = img.convert('RGB')
-    pixels = list(img.getdata())
-    
-    # 过滤掉黑白灰颜色
-    filtered_pixels = [p for p in pixels if is_not_black_white_gray_near(p)]
-    if not filtered_pixels:
+
+    # 过滤掉黑白灰颜色后统计颜色出现频率
+    counts = count_color_bins(np.asarray(img).reshape(-1, 3))
+    if not counts.any():
         return []
-    
-    # 统计颜色出现频率
-    color_counter = Counter(filtered_pixels)
-    candidate_colors = color_counter.most_common(num_colors * 5)  # 提取更多候选颜色
-    
-    macaron_colors = []
+
+    num_candidates = num_colors * 5  # 提取更多候选颜色
+    top = np.sort(np.argpartition(counts, -num_candidates)[-num_candidates:])
+    top = top[np.argsort(-counts[top], kind='stable')]
+    top = top[counts[top] > 0]
+    # 取色块中心作为候选颜色
+    candidate_colors = np.stack([((top >> 10) & 31) * 8 + 4, ((top >> 5) & 31) * 8 + 4, (top & 31) * 8 + 4], axis=1)
+
+    # 批量调整为马卡龙风格，并一次算出候选颜色两两之间的距离
+    adjusted_colors = adjust_colors_macaron(candidate_colors)
+    distances = color_distance_matrix(adjusted_colors, adjusted_colors)
+
+    selected = []
     min_color_distance = 0.15  # 颜色差异阈值
-    
-    for color, _ in candidate_colors:
-        # 调整为马卡龙风格
-        adjusted_color = adjust_color_macaron(color)
-        
+
+    for i in range(len(adjusted_colors)):
         # 检查与已选颜色的差异
-        if not any(color_distance(adjusted_color, existing) < min_color_distance for existing in macaron_colors):
-            macaron_colors.append(adjusted_color)
-            if len(macaron_colors) >= num_colors:
+        if not selected or distances[i, selected].min() >= min_color_distance:
+            selected.append(i)
+            if len(selected) >= num_colors:
                 break
-    
-    return macaron_colors
+
+    return [tuple(color) for color in adjusted_colors[selected].tolist()]
 
 def adjust_background_color(color, darken_factor=0.85):
     """
@@ -134,18 +248,73 @@ def darken_color(color, factor=0.7):
     r, g, b = color
     return (int(r * factor), int(g * factor), int(b * factor))
 
-def add_film_grain(image, intensity=0.05):
-    """添加胶片颗粒效果"""
-    img_array = np.array(image)
-    
-    # 创建随机噪点
-    noise = np.random.normal(0, intensity * 255, img_array.shape)
-    
-    # 应用噪点
-    img_array = img_array + noise
-    img_array = np.clip(img_array, 0, 255).astype(np.uint8)
-    
-    return Image.fromarray(img_array)
+_grain_rng = np.random.default_rng()
+
+def _add_grain(img_array, intensity):
+    """为 uint8 图像数组添加胶片颗粒效果，返回新的PIL.Image"""
+    # 创建随机噪点：均匀分布的整数噪点，幅度取 √3 倍，标准差与 intensity * 255 的高斯噪点相同
+    amplitude = int(round(intensity * 255 * math.sqrt(3)))
+    noise = _grain_rng.integers(-amplitude, amplitude + 1, size=img_array.shape, dtype=np.int16)
+
+    # 应用噪点，在 int16 上相加后截断回 uint8
+    noise += img_array
+    np.clip(noise, 0, 255, out=noise)
+
+    return Image.fromarray(noise.astype(np.uint8))
+
+def blend_and_grain(image, color, color_ratio, intensity=0.03):
+    """
+    将图片与纯色按比例混合并添加胶片颗粒
+
+    Args:
+        image: RGB模式的PIL.Image对象
+        color: 混合颜色 (r, g, b)
+        color_ratio: 颜色所占比例，0-1
+        intensity: 颗粒强度
+
+    Returns:
+        处理后的图片
+    """
+    # 混合交给 Pillow 的 Image.blend，在 C 中逐字节完成
+    solid = Image.new("RGB", image.size, tuple(color[:3]))
+    blended = np.asarray(Image.blend(image, solid, float(color_ratio)))
+
+    # 噪点在 int16 上直接叠加到混合结果上
+    return _add_grain(blended, intensity)
+
+def blend_with_color(image, color, image_ratio):
+    """
+    将RGB图片与纯色按比例混合：image * image_ratio + color * (1 - image_ratio)
+    颜色是常量，每个通道的结果只取决于原像素值，用 256 项查找表由 Pillow 的 point 一次完成
+    """
+    color_ratio = 1 - image_ratio
+    lut = []
+    for channel in color[:3]:
+        lut.extend(min(255, int(value * image_ratio + channel * color_ratio)) for value in range(256))
+    return image.point(lut)
+
+@functools.lru_cache(maxsize=64)
+def get_font(font_path, font_size):
+    """
+    加载字体并按 (路径, 字号) 缓存，避免每次生成封面都重新打开并解析字体文件
+    """
+    return ImageFont.truetype(font_path, font_size)
+
+def downsampled_gaussian_blur(img, radius):
+    """
+    大半径高斯模糊：先缩小再模糊再放大回原尺寸
+    模糊后本身没有细节，缩小 4 倍处理的像素只有 1/16，放大后与直接模糊的差异在 ±4 以内
+    半径较小时直接模糊，避免丢失细节
+    """
+    if radius >= 32:
+        factor = 4
+    elif radius >= 16:
+        factor = 2
+    else:
+        return img.filter(ImageFilter.GaussianBlur(radius=radius))
+
+    small = img.reduce(factor).filter(ImageFilter.GaussianBlur(radius=radius / factor))
+    return small.resize(img.size, Image.BILINEAR)
 
 def crop_to_square(img):
     """将图片裁剪为正方形"""
@@ -159,43 +328,40 @@ def crop_to_square(img):
     
     return img.crop((left, top, right, bottom))
     
+@functools.lru_cache(maxsize=32)
+def get_rounded_mask(width, height, radius):
+    """
+    生成抗锯齿的圆角蒙版(L模式)，相同尺寸和半径只生成一次
+    返回的蒙版会被多次共享，调用方只能读取，不能修改
+    """
+    # 超采样倍数
+    factor = 2
+
+    # 在放大后的尺寸上绘制圆角蒙版
+    mask = Image.new('L', (width * factor, height * factor), 0)
+    draw = ImageDraw.Draw(mask)
+
+    draw.rounded_rectangle([(0, 0), (width * factor, height * factor)],
+                            radius=radius * factor, fill=255)
+
+    # 蒙版按区域平均缩小回原尺寸，边缘得到抗锯齿的过渡透明度
+    return mask.resize((width, height), Image.Resampling.BOX)
+
 def add_rounded_corners(img, radius=30):
     """
-    给图片添加圆角，通过超采样技术消除锯齿
-    
+    给图片添加圆角，只对蒙版做超采样来消除锯齿，图片本身不缩放
+
     Args:
         img: PIL.Image对象
         radius: 圆角半径
-        
+
     Returns:
         带圆角的图片(RGBA模式)
     """
-    # 超采样倍数
-    factor = 2
-    
-    # 获取原始尺寸
-    width, height = img.size
-    
-    # 创建更大尺寸的空白图像（用于超采样）
-    enlarged_img = img.resize((width * factor, height * factor), Image.Resampling.LANCZOS)
-    enlarged_img = enlarged_img.convert("RGBA")
-    
-    # 创建透明蒙版，尺寸为放大后的尺寸
-    mask = Image.new('L', (width * factor, height * factor), 0)
-    draw = ImageDraw.Draw(mask)
-    
-    draw.rounded_rectangle([(0, 0), (width * factor, height * factor)], 
-                            radius=radius * factor, fill=255)
-    
-    # 创建超采样尺寸的透明背景
-    background = Image.new("RGBA", (width * factor, height * factor), (255, 255, 255, 0))
-    
-    # 使用蒙版合成图像（在高分辨率下）
-    high_res_result = Image.composite(enlarged_img, background, mask)
-    
-    # 将结果缩小回原来的尺寸，应用抗锯齿
-    result = high_res_result.resize((width, height), Image.Resampling.LANCZOS)
-    
+    # 直接作为透明通道，convert 总是返回新图片，不会修改传入的图片
+    result = img.convert("RGBA")
+    result.putalpha(get_rounded_mask(img.width, img.height, radius))
+
     return result
 
 def add_card_shadow(img, offset=(10, 10), radius=10, opacity=0.5):
@@ -258,9 +424,10 @@ def add_shadow_and_rotate(canvas, img, angle, offset=(10, 10), radius=10, opacit
     
     # 1. 创建阴影
     # 创建一个更大的阴影画布，给阴影留足空间，避免截断
+    # 阴影是纯黑色，只有透明度不同，因此模糊和旋转都只在单通道(L)的透明度上进行
     padding = max(radius * 4, 100)  # 为阴影提供足够的空间
     shadow_size = (width + padding * 2, height + padding * 2)
-    shadow = Image.new("RGBA", shadow_size, (0, 0, 0, 0))
+    shadow = Image.new("L", shadow_size, 0)
     
     # 准备阴影蒙版
     mask_size = (width, height)
@@ -268,28 +435,30 @@ def add_shadow_and_rotate(canvas, img, angle, offset=(10, 10), radius=10, opacit
     
     # 如果原图是RGBA模式，使用其透明通道作为蒙版
     if img.mode == "RGBA":
-        shadow_mask = img.split()[3]  # 获取Alpha通道作为蒙版
-    
+        shadow_mask = img.getchannel("A")  # 获取Alpha通道作为蒙版
+
     # 在阴影中心位置创建阴影形状
     shadow_center = (padding, padding)
-    shadow.paste((0, 0, 0, int(255 * opacity)), 
-                (shadow_center[0], shadow_center[1], 
-                 shadow_center[0] + width, shadow_center[1] + height), 
+    shadow.paste(int(255 * opacity),
+                (shadow_center[0], shadow_center[1],
+                 shadow_center[0] + width, shadow_center[1] + height),
                 shadow_mask)
-    
+
     # 模糊阴影，使用较大的半径确保柔和效果
     shadow = shadow.filter(ImageFilter.GaussianBlur(radius))
-    
+
     # 2. 旋转阴影和图像
     # 旋转阴影
-    rotated_shadow = rotate_image(shadow, angle)
-    shadow_width, shadow_height = rotated_shadow.size
-    
+    rotated_shadow_alpha = rotate_image(shadow, angle, bg_color=0)
+    shadow_width, shadow_height = rotated_shadow_alpha.size
+
     # 计算旋转后的阴影位置（考虑偏移）
     shadow_x = center_pos[0] - shadow_width // 2 + offset[0]
     shadow_y = center_pos[1] - shadow_height // 2 + offset[1]
-    
-    # 将阴影粘贴到画布上
+
+    # 粘贴时才组装成黑色的RGBA阴影，再粘贴到画布上
+    rotated_shadow = Image.new("RGBA", rotated_shadow_alpha.size, (0, 0, 0, 0))
+    rotated_shadow.putalpha(rotated_shadow_alpha)
     canvas.paste(rotated_shadow, (shadow_x, shadow_y), rotated_shadow)
     
     # 旋转原图
@@ -310,6 +479,26 @@ def rotate_image(img, angle, bg_color=(0, 0, 0, 0)):
     # expand=True 确保旋转后的图片不会被截断
     return img.rotate(angle, Image.BICUBIC, expand=True, fillcolor=bg_color)
 
+@functools.lru_cache(maxsize=32)
+def parse_color(color, default=(255, 0, 0)):
+    """
+    解析颜色字符串为 (r, g, b)，解析失败时返回默认颜色
+    支持 Pillow 的颜色格式（#RGB、#RRGGBB、rgb(...)、颜色名称），以及 "r,g,b" / "(r,g,b)" 格式
+    """
+    if not color:
+        return default
+    try:
+        return ImageColor.getrgb(color)[:3]
+    except ValueError:
+        pass
+    if ',' in color:
+        try:
+            r, g, b = [int(c.strip()) for c in color.strip('()').split(',')[:3]]
+            return r, g, b
+        except ValueError:
+            pass
+    return default
+
 def get_text_vertical_position(draw, text, font, rect_y, rect_height, text_height):
     """
     获取文本的精确垂直位置，确保在矩形内垂直居中
@@ -326,8 +515,8 @@ def get_text_vertical_position(draw, text, font, rect_y, rect_height, text_heigh
         (text_x, text_y): 文本绘制位置
     """
     try:
-        # 方法1：使用textbbox获取精确的文本边界
-        bbox = draw.textbbox((0, 0), text, font=font)
+        # 方法1：使用getbbox获取精确的文本边界
+        bbox = font.getbbox(text)
         
         # 计算文本的实际边界
         actual_top = bbox[1]
@@ -390,25 +579,7 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         draw = ImageDraw.Draw(image)
         
         # 解析背景颜色
-        if bg_color.startswith('#'):
-            bg_color = bg_color.lstrip('#')
-            if len(bg_color) == 6:
-                r = int(bg_color[0:2], 16)
-                g = int(bg_color[2:4], 16)
-                b = int(bg_color[4:6], 16)
-            else:
-                r, g, b = 255, 0, 0  # 默认红色
-        else:
-            # 尝试解析RGB格式
-            try:
-                if ',' in bg_color:
-                    r, g, b = [int(c.strip()) for c in bg_color.strip('()').split(',')[:3]]
-                else:
-                    r, g, b = 255, 0, 0  # 默认红色
-            except:
-                r, g, b = 255, 0, 0  # 默认红色
-        
-        badge_bg_color = (r, g, b)
+        badge_bg_color = parse_color(bg_color, default=(255, 0, 0))
         
         # 计算角标大小
         image_width, image_height = image.size
@@ -420,7 +591,7 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         font = None
         if font_path and os.path.exists(font_path):
             try:
-                font = ImageFont.truetype(font_path, int(base_size))
+                font = get_font(font_path, int(base_size))
             except Exception as e:
                 logger.warning(f"加载角标字体失败 {font_path}: {e}")
                 font = None
@@ -429,17 +600,17 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         if font is None:
             try:
                 # 尝试加载系统字体
-                font = ImageFont.truetype("arial.ttf", int(base_size))
+                font = get_font("arial.ttf", int(base_size))
             except:
                 try:
                     # 尝试加载其他系统字体
-                    font = ImageFont.truetype("DejaVuSans.ttf", int(base_size))
+                    font = get_font("DejaVuSans.ttf", int(base_size))
                 except:
                     # 使用PIL默认字体
                     font = ImageFont.load_default()
         
         # 计算文本尺寸
-        bbox = draw.textbbox((0, 0), number_str, font=font)
+        bbox = font.getbbox(number_str)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
         
@@ -475,48 +646,20 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         text_y = get_text_vertical_position(draw, number_str, font, rect_y, rect_height, text_height)
         
         # 解析文字颜色（如果未提供，则使用白色）
-        if text_color:
-            if text_color.startswith('#'):
-                text_color = text_color.lstrip('#')
-                if len(text_color) == 6:
-                    text_r = int(text_color[0:2], 16)
-                    text_g = int(text_color[2:4], 16)
-                    text_b = int(text_color[4:6], 16)
-                else:
-                    text_r, text_g, text_b = 255, 255, 255  # 默认白色
-            else:
-                # 尝试解析RGB格式
-                try:
-                    if ',' in text_color:
-                        text_r, text_g, text_b = [int(c.strip()) for c in text_color.strip('()').split(',')[:3]]
-                    else:
-                        text_r, text_g, text_b = 255, 255, 255  # 默认白色
-                except:
-                    text_r, text_g, text_b = 255, 255, 255  # 默认白色
-        else:
-            text_r, text_g, text_b = 255, 255, 255  # 默认白色
-        
-        text_fg_color = (text_r, text_g, text_b)
+        text_fg_color = parse_color(text_color, default=(255, 255, 255))
         
         # 创建圆角矩形角标
         # 绘制圆角矩形背景，带透明度
         badge_color_with_alpha = badge_bg_color + (220,)  # 85% 不透明度
-        
-        # 绘制圆角矩形
-        draw.rounded_rectangle(
-            [(rect_x, rect_y), (rect_x + rect_width, rect_y + rect_height)],
-            radius=corner_radius,
-            fill=badge_color_with_alpha
-        )
-        
-        # 添加一点阴影效果
+
+        # 先绘制一点阴影效果
         shadow_offset = 2
-        shadow_rect = [(rect_x + shadow_offset, rect_y + shadow_offset), 
+        shadow_rect = [(rect_x + shadow_offset, rect_y + shadow_offset),
                       (rect_x + rect_width + shadow_offset, rect_y + rect_height + shadow_offset)]
         shadow_color_with_alpha = (0, 0, 0, 80)  # 黑色半透明阴影
         draw.rounded_rectangle(shadow_rect, radius=corner_radius, fill=shadow_color_with_alpha)
-        
-        # 重新绘制前景矩形（覆盖阴影的上半部分）
+
+        # 再绘制前景圆角矩形（覆盖阴影的上半部分）
         draw.rounded_rectangle(
             [(rect_x, rect_y), (rect_x + rect_width, rect_y + rect_height)],
             radius=corner_radius,
@@ -581,7 +724,11 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
         
         num_colors = 6
         # 加载原始图片
-        original_img = Image.open(image_path).convert("RGB")
+        original_img = Image.open(image_path)
+        # 后续用到的最大尺寸是画布大小，JPEG 让 libjpeg 在解码时按 1/2、1/4、1/8 缩小到不小于画布的尺寸
+        if original_img.format == "JPEG":
+            original_img.draft("RGB", canvas_size)
+        original_img = original_img.convert("RGB")
         
         # 从图片提取马卡龙风格的颜色
         candidate_colors = find_dominant_macaron_colors(original_img, num_colors=num_colors)
@@ -598,19 +745,24 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
         ]
         
         # 确保有足够的颜色
-        while len(extracted_colors) < num_colors:
-            # 从备选颜色中选择一个与已有颜色差异最大的
-            if not extracted_colors:
-                extracted_colors.append(random.choice(soft_macaron_colors))
-            else:
-                max_diff = 0
-                best_color = None
-                for color in soft_macaron_colors:
-                    min_dist = min(color_distance(color, existing) for existing in extracted_colors)
-                    if min_dist > max_diff:
-                        max_diff = min_dist
-                        best_color = color
-                extracted_colors.append(best_color or random.choice(soft_macaron_colors))
+        if len(extracted_colors) < num_colors:
+            # 备选颜色之间的距离只算一次，每选入一个颜色只需更新各备选颜色到已有颜色的最小距离
+            soft_distances = color_distance_matrix(soft_macaron_colors, soft_macaron_colors)
+            min_distances = None
+            if extracted_colors:
+                min_distances = color_distance_matrix(soft_macaron_colors, extracted_colors).min(axis=1)
+
+            while len(extracted_colors) < num_colors:
+                # 从备选颜色中选择一个与已有颜色差异最大的
+                if min_distances is None or min_distances.max() <= 0:
+                    best_index = random.randrange(len(soft_macaron_colors))
+                else:
+                    best_index = int(np.argmax(min_distances))
+                extracted_colors.append(soft_macaron_colors[best_index])
+                if min_distances is None:
+                    min_distances = soft_distances[:, best_index]
+                else:
+                    min_distances = np.minimum(min_distances, soft_distances[:, best_index])
         
         # 处理颜色
         bg_color = darken_color(extracted_colors[0], 0.85)  # 背景色
@@ -619,19 +771,10 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
         # 2. 背景处理
         bg_img = original_img.copy()
         bg_img = ImageOps.fit(bg_img, canvas_size, method=Image.LANCZOS)
-        bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=int(blur_size)))  # 强烈模糊化
+        bg_img = downsampled_gaussian_blur(bg_img, int(blur_size))  # 强烈模糊化
         
-        # 将背景图片与背景色混合
-        bg_img_array = np.array(bg_img, dtype=float)
-        bg_color_array = np.array([[bg_color]], dtype=float)
-        
-        # 混合背景图和颜色 (15% 背景图 + 85% 颜色)
-        blended_bg = bg_img_array * (1 - float(color_ratio)) + bg_color_array * float(color_ratio)
-        blended_bg = np.clip(blended_bg, 0, 255).astype(np.uint8)
-        blended_bg_img = Image.fromarray(blended_bg)
-        
-        # 添加胶片颗粒效果增强纹理感
-        blended_bg_img = add_film_grain(blended_bg_img, intensity=0.03)
+        # 将背景图片与背景色混合 (15% 背景图 + 85% 颜色)，同时添加胶片颗粒效果增强纹理感
+        blended_bg_img = blend_and_grain(bg_img, bg_color, color_ratio, intensity=0.03)
         
         # 创建最终画布
         canvas = Image.new("RGBA", canvas_size, (0, 0, 0, 0))
@@ -654,23 +797,15 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
         
         # 辅助卡片1 (中间层) - 与第二种颜色混合，加深颜色
         aux_card1 = square_img.copy().filter(ImageFilter.GaussianBlur(radius=8))
-        aux_card1_array = np.array(aux_card1, dtype=float)
-        card_color1_array = np.array([[card_colors[0]]], dtype=float)
         # 降低原图比例，增加颜色混合比例
-        blended_card1 = aux_card1_array * 0.5 + card_color1_array * 0.5
-        blended_card1 = np.clip(blended_card1, 0, 255).astype(np.uint8)
-        aux_card1 = Image.fromarray(blended_card1)
+        aux_card1 = blend_with_color(aux_card1, card_colors[0], 0.5)
         aux_card1 = add_rounded_corners(aux_card1, radius=card_size//8)
         aux_card1 = aux_card1.convert("RGBA")
-        
+
         # 辅助卡片2 (底层) - 与第三种颜色混合，加深颜色
         aux_card2 = square_img.copy().filter(ImageFilter.GaussianBlur(radius=16))
-        aux_card2_array = np.array(aux_card2, dtype=float)
-        card_color2_array = np.array([[card_colors[1]]], dtype=float)
         # 降低原图比例，增加颜色混合比例
-        blended_card2 = aux_card2_array * 0.4 + card_color2_array * 0.6
-        blended_card2 = np.clip(blended_card2, 0, 255).astype(np.uint8)
-        aux_card2 = Image.fromarray(blended_card2)
+        aux_card2 = blend_with_color(aux_card2, card_colors[1], 0.4)
         aux_card2 = add_rounded_corners(aux_card2, radius=card_size//8)
         aux_card2 = aux_card2.convert("RGBA")
         
@@ -725,8 +860,8 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
         zh_font_size = int(canvas_size[1] * 0.17 * float(zh_font_size_ratio))
         en_font_size = int(canvas_size[1] * 0.07 * float(en_font_size_ratio))
         
-        zh_font = ImageFont.truetype(zh_font_path, zh_font_size)
-        en_font = ImageFont.truetype(en_font_path, en_font_size)
+        zh_font = get_font(zh_font_path, zh_font_size)
+        en_font = get_font(en_font_path, en_font_size)
         
         # 文字颜色和阴影颜色
         text_color = (255, 255, 255, 229)  # 85% 不透明度
@@ -735,32 +870,32 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
         shadow_alpha = 75
         
         # 计算中文标题的位置
-        zh_bbox = draw.textbbox((0, 0), title_zh, font=zh_font)
+        zh_bbox = zh_font.getbbox(title_zh)
         zh_text_w = zh_bbox[2] - zh_bbox[0]
         zh_text_h = zh_bbox[3] - zh_bbox[1]
         zh_x = left_area_center_x - zh_text_w // 2
         zh_y = left_area_center_y - zh_text_h - en_font_size // 2 - 5
         
         # 中文标题阴影效果
-        for offset in range(3, shadow_offset + 1, 2):
-            current_shadow_color = shadow_color[:3] + (shadow_alpha,)
-            shadow_draw.text((zh_x + offset, zh_y + offset), title_zh, font=zh_font, fill=current_shadow_color)
+        # 只绘制一次，放在原先多次偏移绘制的中间位置，柔和的拖影交给后面的高斯模糊
+        current_shadow_color = shadow_color[:3] + (shadow_alpha,)
+        zh_shadow_offset = (3 + shadow_offset) // 2
+        shadow_draw.text((zh_x + zh_shadow_offset, zh_y + zh_shadow_offset), title_zh, font=zh_font, fill=current_shadow_color)
         
         # 中文标题
         draw.text((zh_x, zh_y), title_zh, font=zh_font, fill=text_color)
         
         if title_en:
             # 计算英文标题的位置
-            en_bbox = draw.textbbox((0, 0), title_en, font=en_font)
+            en_bbox = en_font.getbbox(title_en)
             en_text_w = en_bbox[2] - en_bbox[0]
             en_text_h = en_bbox[3] - en_bbox[1]
             en_x = left_area_center_x - en_text_w // 2
             en_y = zh_y + zh_text_h + en_font_size  # 调整英文标题位置，与中文标题有一定间距
             
             # 英文标题阴影效果
-            for offset in range(2, shadow_offset // 2 + 1):
-                current_shadow_color = shadow_color[:3] + (shadow_alpha,)
-                shadow_draw.text((en_x + offset, en_y + offset), title_en, font=en_font, fill=current_shadow_color)
+            en_shadow_offset = (2 + shadow_offset // 2) // 2
+            shadow_draw.text((en_x + en_shadow_offset, en_y + en_shadow_offset), title_en, font=en_font, fill=current_shadow_color)
             
             # 英文标题
             draw.text((en_x, en_y), title_en, font=en_font, fill=text_color)
@@ -783,27 +918,39 @@ def create_style_single_1(image_path, title, font_path, font_size=(1,1), blur_si
                 padding=badge_padding
             )
         
-        def image_to_base64(image, format="auto", quality=85):
+        def image_to_base64(image, format="auto", quality=85, alpha_quality=90):
             buffer = BytesIO()
+
+            def encode():
+                # 直接基于缓冲区视图编码，避免 getvalue 复制
+                return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
             if format.lower() == "auto":
                 if image.mode == "RGBA" or (image.info.get('transparency') is not None):
-                    format = "PNG"
+                    # 带透明通道时优先使用有损 WebP（含 alpha），体积和编码耗时都远小于 PNG
+                    # 上传时 __set_library_image 按文件头设置 Content-Type 和本地文件扩展名
+                    try:
+                        image.save(buffer, format="WEBP", quality=quality, alpha_quality=alpha_quality, method=4)
+                        return encode()
+                    except Exception:
+                        buffer.seek(0)
+                        buffer.truncate()
+                        format = "PNG" # Fallback to PNG if WebP fails
                 else:
                     try:
-                        image.save(buffer, format="WEBP", quality=quality, optimize=True)
-                        base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                        return base64_str
+                        image.save(buffer, format="WEBP", quality=quality, method=4)
+                        return encode()
                     except Exception:
+                        buffer.seek(0)
+                        buffer.truncate()
                         format = "JPEG" # Fallback to JPEG if WebP fails
             if format.lower() == "png":
                 image.save(buffer, format="PNG", optimize=True)
-                base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return base64_str
+                return encode()
             elif format.lower() == "jpeg":
                 image = image.convert("RGB") # Ensure RGB for JPEG
                 image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
-                base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return base64_str
+                return encode()
             else:
                 raise ValueError(f"Unsupported format: {format}")
             
@@ -2,12 +2,14 @@ import base64
 import os
 import random
 import colorsys
-from collections import Counter
+import functools
+import math
+import traceback
 from io import BytesIO
 from pathlib import Path
 
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageFont, ImageOps
+from PIL import Image, ImageColor, ImageDraw, ImageFilter, ImageFont, ImageOps
 
 from app.log import logger
 
@@ -35,6 +37,48 @@ def hsv_to_rgb(h, s, v):
     r, g, b = colorsys.hsv_to_rgb(h, s, v)
     return (int(r * 255), int(g * 255), int(b * 255))
 
+def rgb_array_to_hsv(rgb):
+    """将 (N,3) 的 RGB 数组批量转换为 HSV，结果与 colorsys.rgb_to_hsv 一致。"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    delta = maxc - minc
+    safe_delta = np.where(delta > 0, delta, 1.0)
+    s = np.where(maxc > 0, delta / np.where(maxc > 0, maxc, 1.0), 0.0)
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.select(
+        [r == maxc, g == maxc],
+        [bc - gc, 2.0 + rc - bc],
+        default=4.0 + gc - rc,
+    )
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return h, s, maxc
+
+def hsv_array_to_rgb(h, s, v):
+    """将 HSV 数组批量转换为 (N,3) 的 uint8 RGB 数组，结果与 hsv_to_rgb 一致。"""
+    i = (h * 6.0).astype(np.int64)
+    f = h * 6.0 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    # 按扇区 i 依次取 (r, g, b) 分量
+    candidates = np.stack([v, q, p, t], axis=1)
+    sector_index = np.array([
+        [0, 3, 2],
+        [1, 0, 2],
+        [2, 0, 3],
+        [2, 1, 0],
+        [3, 2, 0],
+        [0, 2, 1],
+    ])[i]
+    rgb = np.take_along_axis(candidates, sector_index, axis=1)
+    rgb = np.where((s == 0)[:, None], v[:, None], rgb)
+    return (rgb * 255).astype(np.uint8)
+
 def adjust_to_macaron(h, s, v, target_saturation_range=(0.2, 0.7), target_value_range=(0.55, 0.85)):
     """将颜色的饱和度和亮度调整到接近马卡龙色系的范围，同时避免颜色过亮。"""
     adjusted_s = min(max(s, target_saturation_range[0]), target_saturation_range[1])
@@ -49,23 +93,36 @@ def find_dominant_vibrant_colors(image, num_colors=5):
     img = image.copy()  
     img.thumbnail((100, 100))
     img = img.convert('RGB')
-    pixels = list(img.getdata())
-    filtered_pixels = [p for p in pixels if is_not_black_white_gray_near(p)]
-    if not filtered_pixels:
+    pixels = np.asarray(img, dtype=np.int32).reshape(-1, 3)
+    r, g, b = pixels[:, 0], pixels[:, 1], pixels[:, 2]
+
+    # 过滤掉黑白灰颜色（与 is_not_black_white_gray_near 判断一致）
+    threshold = 20
+    gray_diff_threshold = 10
+    near_black = (pixels < threshold).all(axis=1)
+    near_white = (pixels > 255 - threshold).all(axis=1)
+    gray = (np.abs(r - g) < gray_diff_threshold) & (np.abs(g - b) < gray_diff_threshold) & (np.abs(r - b) < gray_diff_threshold)
+    keep = ~(near_black | near_white | gray)
+    if not keep.any():
         return []
-    color_counter = Counter(filtered_pixels)
-    dominant_colors = color_counter.most_common(num_colors * 3) # 提取更多候选
+
+    # 将 RGB 打包为单个整数后统计出现次数，次数相同时按首次出现的顺序排列（与 Counter.most_common 一致）
+    keys = (r[keep] << 16) | (g[keep] << 8) | b[keep]
+    unique_keys, first_index, counts = np.unique(keys, return_index=True, return_counts=True)
+    order = np.lexsort((first_index, -counts))[:num_colors * 3] # 提取更多候选
+    dominant_keys = unique_keys[order]
+    dominant_colors = np.stack([(dominant_keys >> 16) & 0xFF, (dominant_keys >> 8) & 0xFF, dominant_keys & 0xFF], axis=1)
+
+    # 批量转换到 HSV 并调整到马卡龙色系（与 adjust_to_macaron 的默认范围一致）
+    h, s, v = rgb_array_to_hsv(dominant_colors)
+    adjusted_colors = hsv_array_to_rgb(h, np.clip(s, 0.2, 0.7), np.clip(v, 0.55, 0.85)).tolist()
+    hue_degrees = (h * 360).astype(np.int64).tolist()
 
     macaron_colors = []
     seen_hues = set() # 避免提取过于相似的颜色
 
-    for color, count in dominant_colors:
-        h, s, v = rgb_to_hsv(color)
-        adjusted_s, adjusted_v = adjust_to_macaron(h, s, v)
-        adjusted_rgb = hsv_to_rgb(h, adjusted_s, adjusted_v)
-
+    for adjusted_rgb, hue_degree in zip(map(tuple, adjusted_colors), hue_degrees):
         # 可以加入一些色调的判断，例如避免过于接近的色调
-        hue_degree = int(h * 360)
         is_similar_hue = any(abs(hue_degree - seen) < 15 for seen in seen_hues) # 15度范围内的色调认为是相似的
 
         if not is_similar_hue and adjusted_rgb not in macaron_colors:
@@ -84,18 +141,72 @@ def darken_color(color, factor=0.7):
     return (int(r * factor), int(g * factor), int(b * factor))
 
 
+_grain_rng = np.random.default_rng()
+
+# 噪点图块比画布多出的边距，每次调用在此范围内随机偏移取视图
+GRAIN_TILE_MARGIN = 64
+
+
+@functools.lru_cache(maxsize=4)
+def get_grain_tile(amplitude):
+    """
+    按幅度生成并缓存一块比画布略大的 int16 噪点图块
+    颗粒只是装饰性纹理，复用同一块噪点并随机偏移，人眼无法分辨，省去每张封面的随机数生成
+    """
+    height = canvas_size[1] + GRAIN_TILE_MARGIN
+    width = canvas_size[0] + GRAIN_TILE_MARGIN
+    tile = _grain_rng.integers(-amplitude, amplitude + 1, size=(height, width, 3), dtype=np.int16)
+    tile.setflags(write=False)
+    return tile
+
+
 def add_film_grain(image, intensity=0.05):
     """添加胶片颗粒效果"""
-    img_array = np.array(image)
-    
-    # 创建随机噪点
-    noise = np.random.normal(0, intensity * 255, img_array.shape)
-    
-    # 应用噪点
-    img_array = img_array + noise
-    img_array = np.clip(img_array, 0, 255).astype(np.uint8)
-    
-    return Image.fromarray(img_array)
+    img_array = np.asarray(image)
+    height, width = img_array.shape[:2]
+
+    # 均匀分布的整数噪点，幅度取 √3 倍，标准差与 intensity * 255 的高斯噪点相同
+    amplitude = int(round(intensity * 255 * math.sqrt(3)))
+    tile = get_grain_tile(amplitude)
+
+    # 在 int16 上相加后截断回 uint8
+    grainy = img_array.astype(np.int16)
+    if img_array.ndim == 3 and img_array.shape[2] == 3 and height <= tile.shape[0] - GRAIN_TILE_MARGIN \
+            and width <= tile.shape[1] - GRAIN_TILE_MARGIN:
+        # 从缓存的噪点图块中随机偏移取一块视图
+        offset_y, offset_x = _grain_rng.integers(0, GRAIN_TILE_MARGIN + 1, size=2)
+        grainy += tile[offset_y:offset_y + height, offset_x:offset_x + width]
+    else:
+        # 尺寸超出图块时退回逐次生成噪点
+        grainy += _grain_rng.integers(-amplitude, amplitude + 1, size=img_array.shape, dtype=np.int16)
+    np.clip(grainy, 0, 255, out=grainy)
+
+    return Image.fromarray(grainy.astype(np.uint8))
+
+
+@functools.lru_cache(maxsize=64)
+def get_font(font_path, font_size):
+    """
+    加载字体并按 (路径, 字号) 缓存，避免每次生成封面都重新打开并解析字体文件
+    """
+    return ImageFont.truetype(font_path, font_size)
+
+
+def downsampled_gaussian_blur(img, radius):
+    """
+    大半径高斯模糊：先缩小再模糊再放大回原尺寸
+    模糊后本身没有细节，缩小 4 倍处理的像素只有 1/16，放大后与直接模糊的差异在 ±4 以内
+    半径较小时直接模糊，避免丢失细节
+    """
+    if radius >= 32:
+        factor = 4
+    elif radius >= 16:
+        factor = 2
+    else:
+        return img.filter(ImageFilter.GaussianBlur(radius=radius))
+
+    small = img.reduce(factor).filter(ImageFilter.GaussianBlur(radius=radius / factor))
+    return small.resize(img.size, Image.BILINEAR)
 
 
 def crop_to_16_9(img):
@@ -127,21 +238,25 @@ def align_image_right(img, canvas_size):
     img_width, img_height = img.size
 
     # 计算缩放比例以匹配画布高度
+    # 先确定走哪个分支再缩放，每个分支只缩放一次，且只缩放最终会保留的区域
+    # （resize 的 box 参数按原图坐标取区域，结果与整幅缩放后再裁剪一致）
     scale_factor = canvas_height / img_height
     new_img_width = int(img_width * scale_factor)
-    resized_img = img.resize((new_img_width, canvas_height), Image.LANCZOS)
     
     # 检查缩放后的图片是否足够宽以覆盖目标宽度
     if new_img_width < target_width:
         # 如果图片不够宽，基于宽度而非高度进行缩放
         scale_factor = target_width / img_width
         new_img_height = int(img_height * scale_factor)
-        resized_img = img.resize((target_width, new_img_height), Image.LANCZOS)
         
         # 将图片垂直居中裁剪
         if new_img_height > canvas_height:
             crop_top = (new_img_height - canvas_height) // 2
-            resized_img = resized_img.crop((0, crop_top, target_width, crop_top + canvas_height))
+            ratio = img_height / new_img_height
+            resized_img = img.resize((target_width, canvas_height), Image.LANCZOS,
+                                     box=(0, crop_top * ratio, img_width, (crop_top + canvas_height) * ratio))
+        else:
+            resized_img = img.resize((target_width, new_img_height), Image.LANCZOS)
         
         # 创建画布并将图片靠右放置
         final_img = Image.new("RGB", canvas_size)
@@ -163,20 +278,28 @@ def align_image_right(img, canvas_size):
     # 确保裁剪边界不为负
     crop_left = max(0, crop_left)
     crop_right = min(new_img_width, crop_right)
+    crop_left, crop_right = int(crop_left), int(crop_right)
+    
+    # 裁剪后的图片靠右放置时会向右超出画布，超出的部分不需要缩放
+    paste_x = canvas_width - (crop_right - crop_left) + int(canvas_width * 0.075)
+    crop_right = min(crop_right, crop_left + canvas_width - paste_x)
     
-    # 进行裁剪
-    cropped_img = resized_img.crop((int(crop_left), 0, int(crop_right), canvas_height))
+    # 进行缩放和裁剪
+    ratio = img_width / new_img_width
+    cropped_img = img.resize((crop_right - crop_left, canvas_height), Image.LANCZOS,
+                             box=(crop_left * ratio, 0, crop_right * ratio, img_height))
     
     # 创建画布并将裁剪后的图片靠右放置
     final_img = Image.new("RGB", canvas_size)
-    paste_x = canvas_width - cropped_img.width + int(canvas_width * 0.075)
     final_img.paste(cropped_img, (paste_x, 0))
     
     return final_img
 
+@functools.lru_cache(maxsize=8)
 def create_diagonal_mask(size, split_top=0.5, split_bottom=0.33):
     """
     创建斜线分割的蒙版。左侧为背景 (255)，右侧为前景 (0)。
+    蒙版只取决于尺寸和分割位置，相同参数只生成一次，调用方只能读取，不能修改
     """
     mask = Image.new('L', size, 255)
     draw = ImageDraw.Draw(mask)
@@ -207,9 +330,11 @@ def create_diagonal_mask(size, split_top=0.5, split_bottom=0.33):
     )
     return mask
 
+@functools.lru_cache(maxsize=8)
 def create_shadow_mask(size, split_top=0.5, split_bottom=0.33, feather_size=40):
     """
     创建一个阴影蒙版，用于左侧图片向右侧图片投射阴影
+    蒙版只取决于尺寸和分割位置，相同参数只生成一次（省去整幅的高斯模糊），调用方只能读取，不能修改
     """
     width, height = size
     top_x = int(width * split_top)
@@ -238,6 +363,26 @@ def create_shadow_mask(size, split_top=0.5, split_bottom=0.33, feather_size=40):
     
     return mask
 
+@functools.lru_cache(maxsize=32)
+def parse_color(color, default=(255, 0, 0)):
+    """
+    解析颜色字符串为 (r, g, b)，解析失败时返回默认颜色
+    支持 Pillow 的颜色格式（#RGB、#RRGGBB、rgb(...)、颜色名称），以及 "r,g,b" / "(r,g,b)" 格式
+    """
+    if not color:
+        return default
+    try:
+        return ImageColor.getrgb(color)[:3]
+    except ValueError:
+        pass
+    if ',' in color:
+        try:
+            r, g, b = [int(c.strip()) for c in color.strip('()').split(',')[:3]]
+            return r, g, b
+        except ValueError:
+            pass
+    return default
+
 def get_text_vertical_position(draw, text, font, rect_y, rect_height, text_height):
     """
     获取文本的精确垂直位置，确保在矩形内垂直居中
@@ -303,40 +448,22 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
     Returns:
         带角标的图像
     """
+    # 如果数字为负数（表示获取失败）或未提供，不显示角标，无需进入后续的字体加载和绘制
+    # 如果数字为0，仍然显示角标
+    if number is None or number < 0:
+        return image
+
     try:
         # 将数字转换为字符串，即使为0也显示
         number_str = str(number)
         if number > 9999:
             number_str = "9999+"
         
-        # 如果数字为0，仍然显示角标
-        if number < 0:
-            # 如果数字为负数（表示获取失败），不显示角标
-            return image
-        
         # 创建绘制对象
         draw = ImageDraw.Draw(image)
         
         # 解析背景颜色
-        if bg_color.startswith('#'):
-            bg_color = bg_color.lstrip('#')
-            if len(bg_color) == 6:
-                r = int(bg_color[0:2], 16)
-                g = int(bg_color[2:4], 16)
-                b = int(bg_color[4:6], 16)
-            else:
-                r, g, b = 255, 0, 0  # 默认红色
-        else:
-            # 尝试解析RGB格式
-            try:
-                if ',' in bg_color:
-                    r, g, b = [int(c.strip()) for c in bg_color.strip('()').split(',')[:3]]
-                else:
-                    r, g, b = 255, 0, 0  # 默认红色
-            except:
-                r, g, b = 255, 0, 0  # 默认红色
-        
-        badge_bg_color = (r, g, b)
+        badge_bg_color = parse_color(bg_color, default=(255, 0, 0))
         
         # 计算角标大小
         image_width, image_height = image.size
@@ -348,7 +475,7 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         font = None
         if font_path and os.path.exists(font_path):
             try:
-                font = ImageFont.truetype(font_path, int(base_size))
+                font = get_font(font_path, int(base_size))
             except Exception as e:
                 logger.warning(f"加载角标字体失败 {font_path}: {e}")
                 font = None
@@ -357,17 +484,17 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         if font is None:
             try:
                 # 尝试加载系统字体
-                font = ImageFont.truetype("arial.ttf", int(base_size))
+                font = get_font("arial.ttf", int(base_size))
             except:
                 try:
                     # 尝试加载其他系统字体
-                    font = ImageFont.truetype("DejaVuSans.ttf", int(base_size))
+                    font = get_font("DejaVuSans.ttf", int(base_size))
                 except:
                     # 使用PIL默认字体
                     font = ImageFont.load_default()
         
         # 计算文本尺寸
-        bbox = draw.textbbox((0, 0), number_str, font=font)
+        bbox = font.getbbox(number_str)
         text_width = bbox[2] - bbox[0]
         text_height = bbox[3] - bbox[1]
         
@@ -403,48 +530,20 @@ def add_badge_to_image(image, number, font_path=None, font_size=1.0,
         text_y = get_text_vertical_position(draw, number_str, font, rect_y, rect_height, text_height)
         
         # 解析文字颜色（如果未提供，则使用白色）
-        if text_color:
-            if text_color.startswith('#'):
-                text_color = text_color.lstrip('#')
-                if len(text_color) == 6:
-                    text_r = int(text_color[0:2], 16)
-                    text_g = int(text_color[2:4], 16)
-                    text_b = int(text_color[4:6], 16)
-                else:
-                    text_r, text_g, text_b = 255, 255, 255  # 默认白色
-            else:
-                # 尝试解析RGB格式
-                try:
-                    if ',' in text_color:
-                        text_r, text_g, text_b = [int(c.strip()) for c in text_color.strip('()').split(',')[:3]]
-                    else:
-                        text_r, text_g, text_b = 255, 255, 255  # 默认白色
-                except:
-                    text_r, text_g, text_b = 255, 255, 255  # 默认白色
-        else:
-            text_r, text_g, text_b = 255, 255, 255  # 默认白色
-        
-        text_fg_color = (text_r, text_g, text_b)
+        text_fg_color = parse_color(text_color, default=(255, 255, 255))
         
         # 创建圆角矩形角标
         # 绘制圆角矩形背景，带透明度
         badge_color_with_alpha = badge_bg_color + (220,)  # 85% 不透明度
-        
-        # 绘制圆角矩形
-        draw.rounded_rectangle(
-            [(rect_x, rect_y), (rect_x + rect_width, rect_y + rect_height)],
-            radius=corner_radius,
-            fill=badge_color_with_alpha
-        )
-        
-        # 添加一点阴影效果
+
+        # 先绘制一点阴影效果
         shadow_offset = 2
-        shadow_rect = [(rect_x + shadow_offset, rect_y + shadow_offset), 
+        shadow_rect = [(rect_x + shadow_offset, rect_y + shadow_offset),
                       (rect_x + rect_width + shadow_offset, rect_y + rect_height + shadow_offset)]
         shadow_color_with_alpha = (0, 0, 0, 80)  # 黑色半透明阴影
         draw.rounded_rectangle(shadow_rect, radius=corner_radius, fill=shadow_color_with_alpha)
-        
-        # 重新绘制前景矩形（覆盖阴影的上半部分）
+
+        # 再绘制前景圆角矩形（覆盖阴影的上半部分）
         draw.rounded_rectangle(
             [(rect_x, rect_y), (rect_x + rect_width, rect_y + rect_height)],
             radius=corner_radius,
@@ -511,8 +610,12 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
         split_top = 0.55    # 顶部分割点在画面五分之三的位置
         split_bottom = 0.4  # 底部分割点在画面二分之一的位置
         
-        # 加载前景图片并处理
-        fg_img_original = Image.open(image_path).convert("RGB")
+        # 加载前景图片并处理，图片读取失败属于预期内的错误，单独处理
+        try:
+            fg_img_original = Image.open(image_path).convert("RGB")
+        except (OSError, ValueError) as e:
+            logger.error(f"读取封面图片失败 {image_path}: {e}")
+            return False
         # 以画面四分之三处为中心处理前景图
         fg_img = align_image_right(fg_img_original, canvas_size)
         
@@ -535,22 +638,19 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
             bg_color = random.choice(soft_colors) # 默认橙色
         shadow_color = darken_color(bg_color, 0.5)  # 加深阴影颜色到50%
         
-        # 加载背景图片
-        bg_img_original = Image.open(image_path).convert("RGB")
-        bg_img = ImageOps.fit(bg_img_original, canvas_size, method=Image.LANCZOS)
+        # 背景图片与前景使用同一张原图，align_image_right 和 ImageOps.fit 都不会修改原图，无需重新解码
+        # 背景之后会被大半径模糊并与纯色混合，LANCZOS 的细节会被完全抹掉，用 BILINEAR 缩放即可
+        bg_img = ImageOps.fit(fg_img_original, canvas_size, method=Image.BILINEAR)
 
         # 强烈模糊化背景图
-        bg_img = bg_img.filter(ImageFilter.GaussianBlur(radius=int(blur_size)))
+        bg_img = downsampled_gaussian_blur(bg_img, int(blur_size))
 
         # 将背景图片与背景色混合
         bg_color = darken_color(bg_color, 0.85)
-        bg_img_array = np.array(bg_img, dtype=float)
-        bg_color_array = np.array([[bg_color]], dtype=float)
-        
+
         # 混合背景图和颜色 (10% 背景图 + 90% 颜色) - 使原图几乎不可见，只保留极少纹理
-        blended_bg = bg_img_array * (1 - float(color_ratio)) + bg_color_array * float(color_ratio)
-        blended_bg = np.clip(blended_bg, 0, 255).astype(np.uint8)
-        blended_bg_img = Image.fromarray(blended_bg)
+        # 混合交给 Pillow 的 Image.blend，在 C 中逐字节完成
+        blended_bg_img = Image.blend(bg_img, Image.new("RGB", canvas_size, bg_color), float(color_ratio))
         
         # 添加胶片颗粒效果增强纹理感
         blended_bg_img = add_film_grain(blended_bg_img, intensity=0.05)
@@ -558,24 +658,17 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
         # 创建斜线分割的蒙版
         diagonal_mask = create_diagonal_mask(canvas_size, split_top, split_bottom)
         
-        # 创建基础画布 - 前景图
-        canvas = fg_img.copy()
+        # 创建基础画布 - 前景图（前景图之后不再使用，直接在其上合成，不再复制）
+        canvas = fg_img
         
         # 创建阴影蒙版 - 使用加深的背景色作为阴影颜色，减小阴影距离
         shadow_mask = create_shadow_mask(canvas_size, split_top, split_bottom, feather_size=30)
         
-        # 创建阴影层 - 使用更加深的背景色
-        shadow_layer = Image.new('RGB', canvas_size, shadow_color)
-        
-        # 创建临时画布用于组合
-        temp_canvas = Image.new('RGB', canvas_size)
-        
-        # 应用阴影到前景图（先将阴影应用到前景图上）
-        temp_canvas.paste(canvas)
-        temp_canvas.paste(shadow_layer, mask=shadow_mask)
+        # 应用阴影到前景图（先将阴影应用到前景图上）- 使用更加深的背景色，直接按蒙版粘贴纯色
+        canvas.paste(shadow_color, mask=shadow_mask)
         
         # 使用蒙版将背景图应用到画布上（背景图会覆盖前景图的左侧部分）
-        canvas = Image.composite(blended_bg_img, temp_canvas, diagonal_mask)
+        canvas.paste(blended_bg_img, mask=diagonal_mask)
         
         # ===== 标题绘制 =====
         # 使用RGBA模式进行绘制，以便设置文字透明度
@@ -594,8 +687,8 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
         zh_font_size = int(canvas_size[1] * 0.17 * float(zh_font_size_ratio))
         en_font_size = int(canvas_size[1] * 0.07 * float(en_font_size_ratio))
         
-        zh_font = ImageFont.truetype(str(zh_font_path), zh_font_size)
-        en_font = ImageFont.truetype(str(en_font_path), en_font_size)
+        zh_font = get_font(str(zh_font_path), zh_font_size)
+        en_font = get_font(str(en_font_path), en_font_size)
         
         # 设置80%透明度的文字颜色 (255, 255, 255, 204) - 204是80%不透明度
         text_color = (255, 255, 255, 229)
@@ -609,11 +702,11 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
         zh_x = left_area_center_x - zh_text_w // 2
         zh_y = left_area_center_y - zh_text_h - en_font_size // 2 - 5
         
-        # 恢复原始的字体阴影效果 - 完全参考原代码
-        for offset in range(3, shadow_offset + 1, 2):
-            # shadow_alpha = int(210 * (1 - offset / shadow_offset))
-            current_shadow_color = shadow_color[:3] + (shadow_alpha,)
-            shadow_draw.text((zh_x + offset, zh_y + offset), title_zh, font=zh_font, fill=current_shadow_color)
+        # 字体阴影效果
+        # 只绘制一次，放在原先多次偏移绘制的中间位置，柔和的拖影交给后面的高斯模糊
+        current_shadow_color = shadow_color[:3] + (shadow_alpha,)
+        zh_shadow_offset = (3 + shadow_offset) // 2
+        shadow_draw.text((zh_x + zh_shadow_offset, zh_y + zh_shadow_offset), title_zh, font=zh_font, fill=current_shadow_color)
         
         # 80%透明度的主文字
         draw.text((zh_x, zh_y), title_zh, font=zh_font, fill=text_color)
@@ -625,20 +718,32 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
             en_text_h = en_bbox[3] - en_bbox[1]
             en_x = left_area_center_x - en_text_w // 2
             en_y = zh_y + zh_text_h + en_font_size
-            # 恢复原始的英文标题阴影效果
-            for offset in range(2, shadow_offset // 2 + 1):
-                # shadow_alpha = int(210 * (1 - offset / (shadow_offset // 2)))
-                current_shadow_color = shadow_color[:3] + (shadow_alpha,)
-                shadow_draw.text((en_x + offset, en_y + offset), title_en, font=en_font, fill=current_shadow_color)
+            # 英文标题阴影效果
+            en_shadow_offset = (2 + shadow_offset // 2) // 2
+            shadow_draw.text((en_x + en_shadow_offset, en_y + en_shadow_offset), title_en, font=en_font, fill=current_shadow_color)
             
             # 80%透明度的英文主文字
             draw.text((en_x, en_y), title_en, font=en_font, fill=text_color)
 
-        blurred_shadow = shadow_layer.filter(ImageFilter.GaussianBlur(radius=shadow_offset))
+        # 阴影只占标题附近的一小块区域，只裁出这块区域模糊后再合成，结果与整幅模糊一致
+        # 高斯模糊的影响范围不超过半径的 3 倍，四周留出这么多的边距即可
+        shadow_bbox = shadow_layer.getbbox()
+        if shadow_bbox:
+            margin = shadow_offset * 3
+            shadow_box = (
+                max(0, shadow_bbox[0] - margin),
+                max(0, shadow_bbox[1] - margin),
+                min(canvas_size[0], shadow_bbox[2] + margin),
+                min(canvas_size[1], shadow_bbox[3] + margin),
+            )
+            blurred_shadow = shadow_layer.crop(shadow_box).filter(ImageFilter.GaussianBlur(radius=shadow_offset))
+            canvas_rgba.alpha_composite(blurred_shadow, shadow_box[:2])
 
-        combined = Image.alpha_composite(canvas_rgba, blurred_shadow)
-        # 把 text_layer 合并到 canvas_rgba 上
-        combined = Image.alpha_composite(combined, text_layer)
+        # 把 text_layer 中有文字的区域合并到 canvas_rgba 上
+        text_bbox = text_layer.getbbox()
+        if text_bbox:
+            canvas_rgba.alpha_composite(text_layer, text_bbox[:2], text_bbox)
+        combined = canvas_rgba
         
         # 7. 添加圆角矩形角标（如果需要）
         if badge_number is not None and badge_number > 0:
@@ -653,31 +758,45 @@ def create_style_single_2(image_path, title, font_path, font_size=(1,1), blur_si
                 padding=badge_padding
             )
 
-        def image_to_base64(image, format="auto", quality=85):
+        def image_to_base64(image, format="auto", quality=85, alpha_quality=90):
             buffer = BytesIO()
+
+            def encode():
+                # 直接基于缓冲区视图编码，避免 getvalue 复制
+                return base64.b64encode(buffer.getbuffer()).decode('ascii')
+
             if format.lower() == "auto":
                 if image.mode == "RGBA" or (image.info.get('transparency') is not None):
-                    format = "PNG"
+                    # 带透明通道时优先使用有损 WebP（含 alpha），体积和编码耗时都远小于 PNG
+                    # 上传时 __set_library_image 按文件头设置 Content-Type 和本地文件扩展名
+                    try:
+                        image.save(buffer, format="WEBP", quality=quality, alpha_quality=alpha_quality, method=4)
+                        return encode()
+                    except Exception:
+                        buffer.seek(0)
+                        buffer.truncate()
+                        format = "PNG" # Fallback to PNG if WebP fails
                 else:
                     try:
-                        image.save(buffer, format="WEBP", quality=quality, optimize=True)
-                        base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                        return base64_str
+                        image.save(buffer, format="WEBP", quality=quality, method=4)
+                        return encode()
                     except Exception:
+                        buffer.seek(0)
+                        buffer.truncate()
                         format = "JPEG" # Fallback to JPEG if WebP fails
             if format.lower() == "png":
                 image.save(buffer, format="PNG", optimize=True)
-                base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return base64_str
+                return encode()
             elif format.lower() == "jpeg":
                 image = image.convert("RGB") # Ensure RGB for JPEG
                 image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
-                base64_str = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return base64_str
+                return encode()
             else:
                 raise ValueError(f"Unsupported format: {format}")
             
         return image_to_base64(combined)
     except Exception as e:
+        # 其余异常多为代码问题，记录完整堆栈，避免被吞掉后难以排查
         logger.error(f"创建单图封面时出错: {e}")
+        logger.error(traceback.format_exc())
         return False
\ No newline at end of file
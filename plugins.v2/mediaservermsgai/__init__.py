@@ -1,11 +1,22 @@
+import heapq
 import re
 import time
 import traceback
 import threading
 import os
+import pickle
+import queue
+import sqlite3
 import urllib.parse
+from collections import defaultdict
+from itertools import groupby
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, List, Dict, Tuple, Optional
 
+import requests
+from requests.adapters import HTTPAdapter
+
 from app.core.cache import cached
 from app.core.event import eventmanager, Event
 from app.helper.mediaserver import MediaServerHelper
@@ -16,6 +27,69 @@ from app.schemas import WebhookEventInfo, ServiceInfo, MediaServerItem
 from app.schemas.types import EventType, MediaType, MediaImageType, NotificationType
 from app.utils.web import WebUtils
 
+# 访问媒体服务器API的共享会话，同一服务器的请求复用连接
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+HTTP_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+# 描述首行中的季集信息，如 "S1 E3"
+SEASON_EPISODE_PATTERN = re.compile(r'S\d+\s+E\d+')
+# 文件路径中的TMDB ID，如 "[tmdbid=12345]"、"{tmdb-12345}"
+TMDB_ID_PATTERN = re.compile(r'[\[{](?:tmdbid|tmdb)[=-](\d+)[\]}]', re.IGNORECASE)
+
+
+# ==================== Webhook事件映射配置 ====================
+WEBHOOK_ACTIONS = MappingProxyType({
+    "library.new": "已入库",
+    "system.webhooktest": "测试",
+    "system.notificationtest": "测试",
+    "playback.start": "开始播放",
+    "playback.stop": "停止播放",
+    "playback.pause": "暂停播放",
+    "playback.unpause": "继续播放",
+    "user.authenticated": "登录成功",
+    "user.authenticationfailed": "登录失败",
+    "media.play": "开始播放",
+    "media.stop": "停止播放",
+    "media.pause": "暂停播放",
+    "media.resume": "继续播放",
+    "item.rate": "标记了",
+    "item.markplayed": "标记已播放",
+    "item.markunplayed": "标记未播放",
+    "PlaybackStart": "开始播放",
+    "PlaybackStop": "停止播放"
+})
+
+# ==================== 媒体服务器默认图标（优化后的官方高清图标）====================
+WEBHOOK_IMAGES = MappingProxyType({
+    "emby": "https://raw.githubusercontent.com/qqcomeup/MoviePilot-Plugins/bb3ca257f74cf000640f9ebadab257bb0850baac/icons/11-11.jpg",
+    "plex": "https://raw.githubusercontent.com/qqcomeup/MoviePilot-Plugins/bb3ca257f74cf000640f9ebadab257bb0850baac/icons/11-11.jpg",
+    "jellyfin": "https://raw.githubusercontent.com/qqcomeup/MoviePilot-Plugins/bb3ca257f74cf000640f9ebadab257bb0850baac/icons/11-11.jpg"
+})
+
+# ==================== 国家/地区中文映射 ====================
+COUNTRY_CN_MAP = MappingProxyType({
+    'CN': '中国大陆', 'US': '美国', 'JP': '日本', 'KR': '韩国',
+    'HK': '中国香港', 'TW': '中国台湾', 'GB': '英国', 'FR': '法国',
+    'DE': '德国', 'IT': '意大利', 'ES': '西班牙', 'IN': '印度',
+    'TH': '泰国', 'RU': '俄罗斯', 'CA': '加拿大', 'AU': '澳大利亚',
+    'SG': '新加坡', 'MY': '马来西亚', 'VN': '越南', 'PH': '菲律宾',
+    'ID': '印度尼西亚', 'BR': '巴西', 'MX': '墨西哥', 'AR': '阿根廷',
+    'NL': '荷兰', 'BE': '比利时', 'SE': '瑞典', 'DK': '丹麦',
+    'NO': '挪威', 'FI': '芬兰', 'PL': '波兰', 'TR': '土耳其'
+})
+
+# ==================== 配置页消息类型选项 ====================
+TYPES_OPTIONS = (
+    {"title": "新入库", "value": "library.new"},
+    {"title": "开始播放", "value": "playback.start|media.play|PlaybackStart"},
+    {"title": "停止播放", "value": "playback.stop|media.stop|PlaybackStop"},
+    {"title": "暂停/继续", "value": "playback.pause|playback.unpause|media.pause|media.resume"},
+    {"title": "用户标记", "value": "item.rate|item.markplayed|item.markunplayed"},
+    {"title": "登录提醒", "value": "user.authenticated|user.authenticationfailed"},
+    {"title": "系统测试", "value": "system.webhooktest|system.notificationtest"},
+)
+
 
 class mediaservermsgai(_PluginBase):
     """
@@ -36,6 +110,9 @@ class mediaservermsgai(_PluginBase):
     DEFAULT_AGGREGATE_TIME = 15                # 默认聚合时间（秒）
     DEFAULT_OVERVIEW_MAX_LENGTH = 150          # 默认简介最大长度
     IMAGE_CACHE_MAX_SIZE = 100                 # 图片缓存最大数量
+    TMDB_META_TTL = 7 * 86400                  # TMDB元数据持久化缓存刷新周期（秒）
+    SERVICE_INFO_CACHE_TTL = 60                # 媒体服务器信息缓存时间（秒）
+    SEND_QUEUE_MAX_SIZE = 1000                 # 通知发送队列最大长度
 
     # ==================== 插件基本信息 ====================
     plugin_name = "媒体库服务器通知AI版"
@@ -53,67 +130,52 @@ class mediaservermsgai(_PluginBase):
     _add_play_link = False                     # 是否添加播放链接
     _mediaservers = None                       # 媒体服务器列表
     _types = []                                # 启用的消息类型
-    _webhook_msg_keys = {}                     # Webhook消息去重缓存
-    _lock = threading.Lock()                   # 线程锁
+    _enabled_events = frozenset()              # 启用的事件名集合（由 _types 按 | 拆分得到）
+    _webhook_msg_keys = {}                     # Webhook消息去重缓存 {key: expire_at}
+    _expiry_heap = []                          # 去重缓存过期堆 [(expire_at, key), ...]，与字典中过期时间不一致的条目视为已失效
+    _service_info_cache = {}                   # 媒体服务器信息缓存 {name: (service, expire_at)}
+    _lock = threading.Lock()                   # 线程锁（事件去重）
     _last_event_cache: Tuple[Optional[Event], float] = (None, 0.0)  # 事件去重缓存
-    _image_cache = {}                          # 图片URL缓存
     _overview_max_length = DEFAULT_OVERVIEW_MAX_LENGTH  # 简介最大长度
     _filter_unrecognized = True                # TMDB未识别视频不发送通知
+    _meta_db: Optional[sqlite3.Connection] = None  # TMDB元数据持久化缓存
+    _meta_lock = threading.Lock()              # 元数据缓存读写锁
+    _meta_executor: Optional[ThreadPoolExecutor] = None  # 元数据后台刷新线程池
+    _meta_refreshing = set()                   # 正在后台刷新的元数据键
+    _io_executor: Optional[ThreadPoolExecutor] = None  # TMDB图片等并行请求线程池
+    _send_queue: Optional[queue.Queue] = None  # 通知发送队列，随发送线程创建，每个队列只有一个发送线程消费
+    _send_thread: Optional[threading.Thread] = None  # 通知发送线程，线程退出时自行置空
+    _send_stop = False                         # 通知发送线程退出标志
+    _send_lock = threading.Lock()              # 保护发送线程的启动、退出与入队
 
     # ==================== TV剧集消息聚合配置 ====================
     _aggregate_enabled = False                 # 是否启用TV剧集聚合功能
     _aggregate_time = DEFAULT_AGGREGATE_TIME   # 聚合时间窗口（秒）
     _pending_messages = {}                     # 待聚合的消息 {series_key: [(event_info, event), ...]}
-    _aggregate_timers = {}                     # 聚合定时器 {series_key: timer}
+    _pending_lock = threading.Lock()           # 待聚合消息锁，与事件去重锁分开，聚合入队/出队不阻塞常规事件
+    _sched_cv = threading.Condition()          # 聚合调度条件变量
+    _sched_heap = []                           # 聚合调度堆 [(fire_at, series_key), ...]
+    _sched_deadline = {}                       # 聚合截止时间 {series_key: fire_at}，与堆顶不一致的条目视为已取消
+    _sched_thread: Optional[threading.Thread] = None  # 聚合调度线程
+    _sched_stop = False                        # 聚合调度线程退出标志
     _smart_category_enabled = True             # 是否启用智能分类（CategoryHelper）
 
-    # ==================== Webhook事件映射配置 ====================
-    _webhook_actions = {
-        "library.new": "已入库",
-        "system.webhooktest": "测试",
-        "system.notificationtest": "测试",
-        "playback.start": "开始播放",
-        "playback.stop": "停止播放",
-        "playback.pause": "暂停播放",
-        "playback.unpause": "继续播放",
-        "user.authenticated": "登录成功",
-        "user.authenticationfailed": "登录失败",
-        "media.play": "开始播放",
-        "media.stop": "停止播放",
-        "media.pause": "暂停播放",
-        "media.resume": "继续播放",
-        "item.rate": "标记了",
-        "item.markplayed": "标记已播放",
-        "item.markunplayed": "标记未播放",
-        "PlaybackStart": "开始播放",
-        "PlaybackStop": "停止播放"
-    }
-    
-    # ==================== 媒体服务器默认图标（优化后的官方高清图标）====================
-    _webhook_images = {
-        "emby": "https://raw.githubusercontent.com/qqcomeup/MoviePilot-Plugins/bb3ca257f74cf000640f9ebadab257bb0850baac/icons/11-11.jpg",
-        "plex": "https://raw.githubusercontent.com/qqcomeup/MoviePilot-Plugins/bb3ca257f74cf000640f9ebadab257bb0850baac/icons/11-11.jpg",
-        "jellyfin": "https://raw.githubusercontent.com/qqcomeup/MoviePilot-Plugins/bb3ca257f74cf000640f9ebadab257bb0850baac/icons/11-11.jpg"
-    }
-
-    # ==================== 国家/地区中文映射 ====================
-    _country_cn_map = {
-        'CN': '中国大陆', 'US': '美国', 'JP': '日本', 'KR': '韩国',
-        'HK': '中国香港', 'TW': '中国台湾', 'GB': '英国', 'FR': '法国',
-        'DE': '德国', 'IT': '意大利', 'ES': '西班牙', 'IN': '印度',
-        'TH': '泰国', 'RU': '俄罗斯', 'CA': '加拿大', 'AU': '澳大利亚',
-        'SG': '新加坡', 'MY': '马来西亚', 'VN': '越南', 'PH': '菲律宾',
-        'ID': '印度尼西亚', 'BR': '巴西', 'MX': '墨西哥', 'AR': '阿根廷',
-        'NL': '荷兰', 'BE': '比利时', 'SE': '瑞典', 'DK': '丹麦',
-        'NO': '挪威', 'FI': '芬兰', 'PL': '波兰', 'TR': '土耳其'
-    }
-
     def __init__(self):
         """
         初始化插件实例
         """
         super().__init__()
         self.category = CategoryHelper()
+        # 按事件名直接分发的处理函数，其余事件走媒体消息流程
+        self._event_handlers = {
+            "system.webhooktest": self._handle_test_event,
+            "system.notificationtest": self._handle_test_event,
+            "user.authenticated": self._handle_login_event,
+            "user.authenticationfailed": self._handle_login_event,
+            "item.rate": self._handle_rate_event,
+            "item.markplayed": self._handle_rate_event,
+            "item.markunplayed": self._handle_rate_event,
+        }
         logger.info("媒体服务器消息插件AI版初始化完成")
         logger.debug(f"插件版本: {self.plugin_version}, 插件名称: {self.plugin_name}")
 
@@ -127,6 +189,7 @@ class mediaservermsgai(_PluginBase):
         if config:
             self._enabled = config.get("enabled")
             self._types = config.get("types") or []
+            self._enabled_events = frozenset(event for group in self._types for event in group.split("|"))
             self._mediaservers = config.get("mediaservers") or []
             self._add_play_link = config.get("add_play_link", False)
             self._overview_max_length = int(config.get("overview_max_length", self.DEFAULT_OVERVIEW_MAX_LENGTH))
@@ -134,6 +197,8 @@ class mediaservermsgai(_PluginBase):
             self._aggregate_time = int(config.get("aggregate_time", self.DEFAULT_AGGREGATE_TIME))
             self._smart_category_enabled = config.get("smart_category_enabled", True)
             self._filter_unrecognized = config.get("filter_unrecognized", True)
+            # 媒体服务器配置可能变化，丢弃已缓存的服务器信息
+            self._service_info_cache.clear()
             
             logger.info("插件配置初始化完成:")
             logger.info(f"  - 启用状态: {self._enabled}")
@@ -145,6 +210,44 @@ class mediaservermsgai(_PluginBase):
             logger.info(f"  - TMDB未识别过滤: {self._filter_unrecognized}")
             logger.info(f"  - 简介最大长度: {self._overview_max_length}")
 
+        # 插件未启用时不创建元数据库文件、线程池和发送线程，不占用连接和线程
+        if self._enabled:
+            self._init_meta_cache()
+            if not self._io_executor:
+                self._io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="mediaservermsgai-io")
+            with self._send_lock:
+                # 上次停止时未退出的发送线程继续使用，它会忽略队列中残留的退出标记
+                self._send_stop = False
+                if not self._send_thread:
+                    self._send_queue = queue.Queue(maxsize=self.SEND_QUEUE_MAX_SIZE)
+                    self._send_thread = threading.Thread(target=self._send_loop, args=(self._send_queue,),
+                                                         name="mediaservermsgai-send", daemon=True)
+                    self._send_thread.start()
+
+    def _init_meta_cache(self):
+        """
+        初始化TMDB元数据持久化缓存（插件数据目录下的SQLite库）
+        打开失败时不影响通知，识别会直接走TMDB
+        """
+        if self._meta_db:
+            return
+        try:
+            db_path = self.get_data_path() / "tmdb_meta.db"
+            conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tmdb_meta ("
+                "tmdb_id INTEGER, mtype TEXT, payload BLOB, synced_at INTEGER, "
+                "PRIMARY KEY (tmdb_id, mtype))"
+            )
+            conn.commit()
+            self._meta_db = conn
+            self._meta_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mediaservermsgai-meta")
+            logger.debug(f"TMDB元数据缓存已打开: {db_path}")
+        except Exception as e:
+            logger.warning(f"打开TMDB元数据缓存失败，将直接请求TMDB: {str(e)}")
+            self._meta_db = None
+
     def service_infos(self, type_filter: Optional[str] = None) -> Optional[Dict[str, ServiceInfo]]:
         """
         获取媒体服务器信息服务信息
@@ -191,6 +294,12 @@ class mediaservermsgai(_PluginBase):
             ServiceInfo: 媒体服务器服务信息
         """
         logger.debug(f"查找媒体服务器: {name}")
+        # 同一事件会多次查询同一服务器（过滤、TMDB ID、播放链接等），短时间内直接复用
+        cached_service, expire_at = self._service_info_cache.get(name, (None, 0.0))
+        if cached_service and expire_at > time.monotonic():
+            logger.debug(f"使用缓存的媒体服务器信息: {name}")
+            return cached_service
+
         services = self.service_infos()
         if not services:
             logger.warning(f"没有找到任何媒体服务器")
@@ -199,6 +308,7 @@ class mediaservermsgai(_PluginBase):
         service = services.get(name)
         if service:
             logger.debug(f"找到媒体服务器: {name}")
+            self._service_info_cache[name] = (service, time.monotonic() + self.SERVICE_INFO_CACHE_TTL)
         else:
             logger.warning(f"未找到媒体服务器: {name}")
         
@@ -240,15 +350,6 @@ class mediaservermsgai(_PluginBase):
         Returns:
             Tuple[List[dict], Dict[str, Any]]: 页面配置和默认数据
         """
-        types_options = [
-            {"title": "新入库", "value": "library.new"},
-            {"title": "开始播放", "value": "playback.start|media.play|PlaybackStart"},
-            {"title": "停止播放", "value": "playback.stop|media.stop|PlaybackStop"},
-            {"title": "暂停/继续", "value": "playback.pause|playback.unpause|media.pause|media.resume"},
-            {"title": "用户标记", "value": "item.rate|item.markplayed|item.markunplayed"},
-            {"title": "登录提醒", "value": "user.authenticated|user.authenticationfailed"},
-            {"title": "系统测试", "value": "system.webhooktest|system.notificationtest"},
-        ]
         return [
             {
                 'component': 'VForm',
@@ -269,7 +370,7 @@ class mediaservermsgai(_PluginBase):
                     {
                         'component': 'VRow', 
                         'content': [
-                            {'component': 'VCol', 'props': {'cols': 12}, 'content': [{'component': 'VSelect', 'props': {'chips': True, 'multiple': True, 'model': 'types', 'label': '消息类型', 'items': types_options}}]}
+                            {'component': 'VCol', 'props': {'cols': 12}, 'content': [{'component': 'VSelect', 'props': {'chips': True, 'multiple': True, 'model': 'types', 'label': '消息类型', 'items': list(TYPES_OPTIONS)}}]}
                         ]
                     },
                     {
@@ -333,7 +434,9 @@ class mediaservermsgai(_PluginBase):
             logger.info("=" * 60)
             logger.info("收到新的Webhook事件")
             logger.info(f"事件ID: {event.event_id}")
-            logger.info(f"接收时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+            # 接收时间只格式化一次，向下传给各消息构建函数
+            received_time = time.strftime('%Y-%m-%d %H:%M:%S')
+            logger.info(f"接收时间: {received_time}")
             
             # 1. 检查插件是否启用
             if not self._enabled:
@@ -353,16 +456,12 @@ class mediaservermsgai(_PluginBase):
             logger.info(f"用户: {event_info.user_name}")
             
             # 2. 兼容性处理：如果没有映射的动作，尝试使用原始事件名
-            if not self._webhook_actions.get(event_info.event):
+            if not WEBHOOK_ACTIONS.get(event_info.event):
                 logger.warning(f"未知的Webhook事件类型: {event_info.event}")
                 return
 
-            # 3. 类型过滤 - 将配置的类型预处理为一个扁平集合，提高查找效率
-            allowed_types = set()
-            for _type in self._types:
-                allowed_types.update(_type.split("|"))
-            
-            if event_info.event not in allowed_types:
+            # 3. 类型过滤 - 配置的类型已在 init_plugin 中拆分为扁平集合
+            if event_info.event not in self._enabled_events:
                 logger.info(f"未开启 {event_info.event} 类型的消息通知")
                 return
 
@@ -396,28 +495,18 @@ class mediaservermsgai(_PluginBase):
             # 6. 根据事件类型分发处理
             logger.info(f"开始处理事件类型: {event_type}")
             
-            # === 系统测试消息 ===
-            if "test" in event_type:
-                logger.info("处理系统测试消息")
-                self._handle_test_event(event_info)
-                return
-
-            # === 用户登录消息 ===
-            if "user.authentic" in event_type:
-                logger.info("处理用户登录消息")
-                self._handle_login_event(event_info)
-                return
-
-            # === 评分/标记消息 ===
-            if "item." in event_type and ("rate" in event_type or "mark" in event_type):
-                logger.info("处理评分/标记消息")
-                self._handle_rate_event(event_info)
+            # === 系统测试/用户登录/评分标记消息：按事件名直接分发 ===
+            handler = self._event_handlers.get(event_info.event)
+            if handler:
+                logger.info(f"分发事件到处理函数: {handler.__name__}")
+                handler(event_info, received_time)
                 return
 
             # === 音乐专辑处理 ===
-            if event_info.json_object and event_info.json_object.get('Item', {}).get('Type') == 'MusicAlbum' and event_type == 'library.new':
+            item = self._get_item(event_info)
+            if item.get('Type') == 'MusicAlbum' and event_type == 'library.new':
                 logger.info("处理音乐专辑消息")
-                self._handle_music_album(event_info, event_info.json_object.get('Item', {}))
+                self._handle_music_album(event_info, item, received_time)
                 return
 
             # === 剧集聚合处理 ===
@@ -433,7 +522,7 @@ class mediaservermsgai(_PluginBase):
 
             # === 常规媒体消息 ===
             logger.info("处理常规媒体消息")
-            self._process_media_event(event, event_info)
+            self._process_media_event(event, event_info, received_time)
 
         except Exception as e:
             logger.error(f"Webhook分发异常: {str(e)}")
@@ -443,38 +532,40 @@ class mediaservermsgai(_PluginBase):
             logger.info("事件处理完成")
             logger.info("=" * 60)
 
-    def _handle_test_event(self, event_info: WebhookEventInfo):
+    def _handle_test_event(self, event_info: WebhookEventInfo, received_time: Optional[str] = None):
         """
         处理测试消息
 
         Args:
             event_info (WebhookEventInfo): Webhook事件信息
+            received_time (str, optional): 事件接收时间，未提供时取当前时间
         """
         logger.info("发送测试消息通知")
         title = f"🔔 媒体服务器通知测试"
         server_name = self._get_server_name_cn(event_info)
         texts = [
             f"来自：{server_name}",
-            f"时间：{time.strftime('%Y-%m-%d %H:%M:%S')}",
+            f"时间：{received_time or time.strftime('%Y-%m-%d %H:%M:%S')}",
             f"状态：连接正常"
         ]
         if event_info.user_name:
             texts.append(f"用户：{event_info.user_name}")
         
         logger.debug(f"发送测试消息: {title}")
-        self.post_message(
+        self._send_notification(
             mtype=NotificationType.MediaServer,
             title=title,
             text="\n".join(texts),
-            image=self._webhook_images.get(event_info.channel)
+            image=WEBHOOK_IMAGES.get(event_info.channel)
         )
 
-    def _handle_login_event(self, event_info: WebhookEventInfo):
+    def _handle_login_event(self, event_info: WebhookEventInfo, received_time: Optional[str] = None):
         """
         处理登录消息
 
         Args:
             event_info (WebhookEventInfo): Webhook事件信息
+            received_time (str, optional): 事件接收时间，未提供时取当前时间
         """
         logger.info("处理登录事件通知")
         action = "登录成功" if "authenticated" in event_info.event and "failed" not in event_info.event else "登录失败"
@@ -482,13 +573,13 @@ class mediaservermsgai(_PluginBase):
         
         texts = []
         texts.append(f"👤 用户：{event_info.user_name}")
-        texts.append(f"⏰ 时间：{time.strftime('%Y-%m-%d %H:%M:%S')}")
+        texts.append(f"⏰ 时间：{received_time or time.strftime('%Y-%m-%d %H:%M:%S')}")
         
         if event_info.device_name:
             texts.append(f"📱 设备：{event_info.client} {event_info.device_name}")
         if event_info.ip:
             try:
-                location = WebUtils.get_location(event_info.ip)
+                location = self._get_ip_location(event_info.ip)
                 texts.append(f"🌐 IP：{event_info.ip} {location}")
             except Exception as e:
                 logger.debug(f"获取IP位置信息时出错: {str(e)}")
@@ -498,19 +589,20 @@ class mediaservermsgai(_PluginBase):
         texts.append(f"🖥️ 服务器：{server_name}")
 
         logger.debug(f"发送登录消息: {title}")
-        self.post_message(
+        self._send_notification(
             mtype=NotificationType.MediaServer,
             title=title,
             text="\n".join(texts),
-            image=self._webhook_images.get(event_info.channel)
+            image=WEBHOOK_IMAGES.get(event_info.channel)
         )
 
-    def _handle_rate_event(self, event_info: WebhookEventInfo):
+    def _handle_rate_event(self, event_info: WebhookEventInfo, received_time: Optional[str] = None):
         """
         处理评分/标记消息
 
         Args:
             event_info (WebhookEventInfo): Webhook事件信息
+            received_time (str, optional): 事件接收时间，未提供时取当前时间
         """
         logger.info("处理评分/标记事件通知")
         
@@ -526,8 +618,8 @@ class mediaservermsgai(_PluginBase):
         title = f"⭐ 用户评分：{item_name}"
         texts = []
         texts.append(f"👤 用户：{event_info.user_name}")
-        texts.append(f"🏷️ 标记：{self._webhook_actions.get(event_info.event, '已标记')}")
-        texts.append(f"⏰ 时间：{time.strftime('%Y-%m-%d %H:%M:%S')}")
+        texts.append(f"🏷️ 标记：{WEBHOOK_ACTIONS.get(event_info.event, '已标记')}")
+        texts.append(f"⏰ 时间：{received_time or time.strftime('%Y-%m-%d %H:%M:%S')}")
         
         # 尝试获取图片
         tmdb_id = self._extract_tmdb_id(event_info)
@@ -540,16 +632,18 @@ class mediaservermsgai(_PluginBase):
                 logger.debug(f"成功获取TMDB图片: {image_url[:50]}...")
 
         logger.debug(f"发送评分消息: {title}")
-        self.post_message(
+        self._send_notification(
             mtype=NotificationType.MediaServer,
             title=title,
             text="\n".join(texts),
-            image=image_url or self._webhook_images.get(event_info.channel)
+            image=image_url or WEBHOOK_IMAGES.get(event_info.channel)
         )
 
-    def _process_media_event(self, event: Event, event_info: WebhookEventInfo):
+    def _process_media_event(self, event: Event, event_info: WebhookEventInfo, received_time: Optional[str] = None):
         """处理常规媒体消息（入库/播放）"""
         try:
+            # 聚合回退等延迟发送的场景在发送时取当前时间
+            received_time = received_time or time.strftime('%Y-%m-%d %H:%M:%S')
             logger.info("开始处理媒体事件")
             logger.debug(f"事件详情: {event_info.event}, 媒体: {event_info.item_name}")
             
@@ -567,7 +661,7 @@ class mediaservermsgai(_PluginBase):
                 return
             
             with self._lock:
-                current_time = time.time()
+                current_time = time.monotonic()
                 last_event, last_time = self._last_event_cache
                 if last_event and (current_time - last_time < 2):
                     if last_event.event_id == event.event_id or last_event.event_data == event_info: 
@@ -585,20 +679,19 @@ class mediaservermsgai(_PluginBase):
             message_texts = []
             message_title = ""
             image_url = event_info.image_url
+            item = self._get_item(event_info)
             
             # 3. 音频单曲特殊处理
             if event_info.item_type == "AUD":
                 logger.info("处理音频文件")
-                self._build_audio_message(event_info, message_texts)
+                self._build_audio_message(item, message_texts, received_time)
                 # 标题构造
-                action_base = self._webhook_actions.get(event_info.event, "通知")
+                action_base = WEBHOOK_ACTIONS.get(event_info.event, "通知")
                 server_name = self._get_server_name_cn(event_info)
-                song_name = event_info.item_name
-                if event_info.json_object:
-                    song_name = event_info.json_object.get('Item', {}).get('Name') or song_name
+                song_name = item.get('Name') or event_info.item_name
                 message_title = f"{song_name} {action_base} {server_name}"
                 # 图片
-                img = self._get_audio_image_url(event_info.server_name, event_info.json_object.get('Item', {}))
+                img = self._get_audio_image_url(event_info.server_name, item)
                 if img: 
                     image_url = img
                     logger.debug(f"获取到音频图片: {img[:50]}...")
@@ -606,12 +699,18 @@ class mediaservermsgai(_PluginBase):
             # 4. 视频处理 (TV/MOV)
             else:
                 logger.info(f"处理视频文件，类型: {event_info.item_type}")
+                # TMDB图片与媒体识别互不依赖，先提交图片请求与识别并行
+                image_future = None
+                if not image_url and tmdb_id and event_info.item_type in ["TV", "SHOW", "MOV"]:
+                    image_mtype = MediaType.MOVIE if event_info.item_type == "MOV" else MediaType.TV
+                    image_future = self._submit_io(self._get_tmdb_image, event_info, image_mtype)
+
                 tmdb_info = None
                 if tmdb_id:
                     mtype = MediaType.MOVIE if event_info.item_type == "MOV" else MediaType.TV
                     logger.debug(f"尝试识别TMDB媒体: {tmdb_id}, 类型: {mtype}")
                     try:
-                        tmdb_info = self.chain.recognize_media(tmdbid=int(tmdb_id), mtype=mtype)
+                        tmdb_info = self._recognize_media(tmdb_id, mtype)
                         if tmdb_info:
                             logger.info(f"TMDB信息识别成功: {tmdb_info.title if hasattr(tmdb_info, 'title') else 'Unknown'}")
                         else:
@@ -623,12 +722,12 @@ class mediaservermsgai(_PluginBase):
                 title_name = tmdb_info.title if (tmdb_info and tmdb_info.title) else event_info.item_name
                 logger.debug(f"原始标题: {title_name}")
                 
-                year = tmdb_info.year if (tmdb_info and tmdb_info.year) else event_info.json_object.get('Item', {}).get('ProductionYear')
+                year = tmdb_info.year if (tmdb_info and tmdb_info.year) else item.get('ProductionYear')
                 if year and str(year) not in title_name:
                     title_name += f" ({year})"
                     logger.debug(f"添加年份信息: {year}")
                 
-                action_base = self._webhook_actions.get(event_info.event, "通知")
+                action_base = WEBHOOK_ACTIONS.get(event_info.event, "通知")
                 logger.debug(f"事件动作: {action_base}")
 
                 # 根据事件类型设置不同的标题前缀
@@ -648,7 +747,7 @@ class mediaservermsgai(_PluginBase):
                 logger.debug(f"消息标题: {message_title}")
 
                 # 内容构造
-                message_texts.append(f"⏰ 时间：{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())}")
+                message_texts.append(f"⏰ 时间：{received_time}")
                 
                 # 智能分类（优先使用CategoryHelper，fallback到路径解析）
                 category = None
@@ -666,7 +765,7 @@ class mediaservermsgai(_PluginBase):
                 
                 if not category:
                     logger.debug("使用路径解析分类")
-                    is_folder = event_info.json_object.get('Item', {}).get('IsFolder', False) if event_info.json_object else False
+                    is_folder = item.get('IsFolder', False)
                     category = self._get_category_from_path(event_info.item_path, event_info.item_type, is_folder)
                     if category:
                         logger.debug(f"路径解析分类: {category}")
@@ -696,12 +795,9 @@ class mediaservermsgai(_PluginBase):
                     logger.debug("播放事件，不显示简介")
 
                 # 图片
-                if not image_url:
-                    logger.debug("尝试获取TMDB图片")
-                    if event_info.item_type in ["TV", "SHOW"] and tmdb_id:
-                        image_url = self._get_tmdb_image(event_info, MediaType.TV)
-                    elif event_info.item_type == "MOV" and tmdb_id:
-                        image_url = self._get_tmdb_image(event_info, MediaType.MOVIE)
+                if image_future:
+                    logger.debug("等待TMDB图片")
+                    image_url = image_future.result()
                     
                     if image_url:
                         logger.debug(f"获取到TMDB图片: {image_url[:50]}...")
@@ -719,7 +815,7 @@ class mediaservermsgai(_PluginBase):
             
             # 7. 兜底图片
             if not image_url:
-                image_url = self._webhook_images.get(event_info.channel)
+                image_url = WEBHOOK_IMAGES.get(event_info.channel)
                 logger.debug(f"使用默认图片: {event_info.channel}")
 
             # 8. 缓存管理（用于过滤重复停止事件）
@@ -737,7 +833,7 @@ class mediaservermsgai(_PluginBase):
             logger.debug(f"消息图片: {'已设置' if image_url else '未设置'}")
             logger.debug(f"播放链接: {'已设置' if play_link else '未设置'}")
             
-            self.post_message(
+            self._send_notification(
                 mtype=NotificationType.MediaServer,
                 title=message_title,
                 text="\n".join(message_texts),
@@ -745,7 +841,7 @@ class mediaservermsgai(_PluginBase):
                 link=play_link
             )
             
-            logger.info("消息发送完成")
+            logger.info("消息已加入发送队列")
             
         except Exception as e:
             logger.error(f"处理媒体事件异常: {str(e)}")
@@ -753,17 +849,16 @@ class mediaservermsgai(_PluginBase):
             logger.error(traceback.format_exc())
 
     # === 辅助构建函数 ===
-    def _build_audio_message(self, event_info, texts):
+    def _build_audio_message(self, item_data: dict, texts, received_time: str):
         """构建音频消息内容"""
         logger.debug("构建音频消息内容")
-        item_data = event_info.json_object.get('Item', {})
         artist = (item_data.get('Artists') or ['未知歌手'])[0]
         album = item_data.get('Album', '')
         duration = self._format_ticks(item_data.get('RunTimeTicks', 0))
         container = item_data.get('Container', '').upper()
         size = self._format_size(item_data.get('Size', 0))
 
-        texts.append(f"⏰ 时间：{time.strftime('%H:%M:%S', time.localtime())}")
+        texts.append(f"⏰ 时间：{received_time[11:]}")
         texts.append(f"👤 歌手：{artist}")
         if album: 
             texts.append(f"💿 专辑：{album}")
@@ -772,6 +867,75 @@ class mediaservermsgai(_PluginBase):
         texts.append(f"📦 格式：{container} · {size}")
         logger.debug(f"音频信息: 歌手={artist}, 时长={duration}, 格式={container}")
 
+    @staticmethod
+    def _get_item(event_info: WebhookEventInfo) -> dict:
+        """获取Webhook原始数据中的Item字典，缺失时返回空字典"""
+        json_object = event_info.json_object
+        if not isinstance(json_object, dict):
+            return {}
+        return json_object.get('Item') or {}
+
+    def _send_notification(self, **kwargs):
+        """
+        投递通知消息，由发送线程调用 post_message，Webhook处理不必等待通知渠道
+
+        发送线程未运行、正在停止或队列已满时在当前线程同步发送，消息不会丢失
+        """
+        with self._send_lock:
+            if self._send_thread and not self._send_stop:
+                try:
+                    self._send_queue.put_nowait(kwargs)
+                    logger.debug(f"通知已入队，当前队列长度: {self._send_queue.qsize()}")
+                    return
+                except queue.Full:
+                    logger.warning("通知发送队列已满，改为同步发送")
+        self.post_message(**kwargs)
+
+    def _send_loop(self, send_queue: queue.Queue):
+        """
+        通知发送线程：按入队顺序逐条发送
+
+        收到 None 且插件已停止时退出；退出判断与入队都在 _send_lock 下进行，
+        停止后不会再有消息进入队列，退出前会先清空自身引用，重新启用时再创建新线程
+        """
+        while True:
+            kwargs = send_queue.get()
+            try:
+                if kwargs is None:
+                    with self._send_lock:
+                        if self._send_stop:
+                            self._send_thread = None
+                            logger.debug("通知发送线程退出")
+                            return
+                    # 停止期间插件又被重新启用，忽略残留的退出标记
+                    continue
+                self.post_message(**kwargs)
+            except Exception as e:
+                logger.error(f"发送通知消息失败: {str(e)}")
+                logger.error(traceback.format_exc())
+            finally:
+                send_queue.task_done()
+
+    def _submit_io(self, func, *args) -> Future:
+        """
+        在IO线程池中执行网络请求，线程池不可用（插件已停止）时在当前线程同步执行
+
+        Returns:
+            Future: 请求结果
+        """
+        if self._io_executor:
+            try:
+                return self._io_executor.submit(func, *args)
+            except RuntimeError:
+                # 线程池已关闭
+                pass
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
     def _get_series_id(self, event_info: WebhookEventInfo) -> Optional[str]:
         """获取剧集系列ID"""
         logger.debug("获取剧集系列ID")
@@ -788,39 +952,65 @@ class mediaservermsgai(_PluginBase):
     def _aggregate_tv_episodes(self, series_id: str, event_info: WebhookEventInfo, event: Event):
         """聚合TV剧集消息"""
         logger.info(f"开始聚合TV剧集消息，series_id={series_id}")
-        with self._lock:
-            if series_id not in self._pending_messages:
-                self._pending_messages[series_id] = []
-                logger.debug(f"创建新的聚合队列: {series_id}")
-            
-            self._pending_messages[series_id].append((event_info, event))
-            logger.debug(f"添加到聚合队列，当前队列长度: {len(self._pending_messages[series_id])}")
-            
-            if series_id in self._aggregate_timers:
-                logger.debug(f"取消现有定时器: {series_id}")
-                self._aggregate_timers[series_id].cancel()
-            
-            logger.info(f"设置聚合定时器，等待 {self._aggregate_time} 秒")
-            timer = threading.Timer(self._aggregate_time, self._send_aggregated_message, [series_id])
-            self._aggregate_timers[series_id] = timer
-            timer.start()
-            logger.debug(f"定时器已启动: {series_id}")
+        with self._pending_lock:
+            pending = self._pending_messages.setdefault(series_id, [])
+            pending.append((event_info, event))
+            logger.debug(f"添加到聚合队列，当前队列长度: {len(pending)}")
+
+        # 重新设置截止时间，旧的堆条目在调度线程中按截止时间不一致忽略
+        logger.info(f"设置聚合截止时间，等待 {self._aggregate_time} 秒")
+        fire_at = time.monotonic() + self._aggregate_time
+        with self._sched_cv:
+            self._sched_deadline[series_id] = fire_at
+            heapq.heappush(self._sched_heap, (fire_at, series_id))
+            self._ensure_sched_thread()
+            self._sched_cv.notify()
+        logger.debug(f"聚合已调度: {series_id}")
+
+    def _ensure_sched_thread(self):
+        """确保聚合调度线程在运行（需持有 _sched_cv）"""
+        self._sched_stop = False
+        if self._sched_thread and self._sched_thread.is_alive():
+            return
+        self._sched_thread = threading.Thread(target=self._sched_loop, name="mediaservermsgai-aggregate", daemon=True)
+        self._sched_thread.start()
+        logger.debug("聚合调度线程已启动")
+
+    def _sched_loop(self):
+        """聚合调度线程：按截止时间依次发送到期的剧集聚合消息"""
+        while True:
+            with self._sched_cv:
+                while True:
+                    if self._sched_stop:
+                        logger.debug("聚合调度线程退出")
+                        return
+                    if not self._sched_heap:
+                        self._sched_cv.wait()
+                        continue
+                    fire_at, series_id = self._sched_heap[0]
+                    delay = fire_at - time.monotonic()
+                    if delay > 0:
+                        self._sched_cv.wait(delay)
+                        continue
+                    heapq.heappop(self._sched_heap)
+                    if self._sched_deadline.get(series_id) != fire_at:
+                        # 已被后续剧集推迟的旧条目
+                        continue
+                    del self._sched_deadline[series_id]
+                    break
+            try:
+                self._send_aggregated_message(series_id)
+            except Exception as e:
+                logger.error(f"发送聚合消息时出错: {str(e)}")
+                logger.error(traceback.format_exc())
 
     def _send_aggregated_message(self, series_id: str):
         """发送聚合的剧集消息"""
         logger.info(f"发送聚合消息，series_id={series_id}")
-        with self._lock:
-            if series_id not in self._pending_messages or not self._pending_messages[series_id]:
-                logger.debug(f"聚合队列为空，series_id={series_id}")
-                if series_id in self._aggregate_timers: 
-                    del self._aggregate_timers[series_id]
-                return
-            
-            logger.debug(f"获取聚合消息，数量: {len(self._pending_messages[series_id])}")
-            msg_list = self._pending_messages.pop(series_id)
-            if series_id in self._aggregate_timers: 
-                del self._aggregate_timers[series_id]
-            logger.debug(f"清理定时器和队列: {series_id}")
+        with self._pending_lock:
+            msg_list = self._pending_messages.pop(series_id, None)
+        if msg_list:
+            logger.debug(f"获取聚合消息，数量: {len(msg_list)}，已清理聚合队列: {series_id}")
 
         if not msg_list: 
             logger.debug("消息列表为空")
@@ -841,22 +1031,27 @@ class mediaservermsgai(_PluginBase):
         tmdb_id = self._extract_tmdb_id(first_info)
         first_info.tmdb_id = tmdb_id
         
+        image_url = first_info.image_url
+        image_future = None
+        if not image_url and tmdb_id:
+            # 与媒体识别并行请求TMDB图片
+            image_future = self._submit_io(self._get_tmdb_image, first_info, MediaType.TV)
+
         tmdb_info = None
         if tmdb_id:
             logger.debug(f"识别TMDB信息: {tmdb_id}")
             try:
-                tmdb_info = self.chain.recognize_media(tmdbid=int(tmdb_id), mtype=MediaType.TV)
+                tmdb_info = self._recognize_media(tmdb_id, MediaType.TV)
                 if tmdb_info:
                     logger.info(f"TMDB信息识别成功")
             except Exception as e:
                 logger.error(f"识别TMDB信息异常: {str(e)}")
 
-        title_name = first_info.item_name
-        if first_info.json_object:
-            title_name = first_info.json_object.get('Item', {}).get('SeriesName') or title_name
-            logger.debug(f"获取系列名称: {title_name}")
+        first_item = self._get_item(first_info)
+        title_name = first_item.get('SeriesName') or first_info.item_name
+        logger.debug(f"获取系列名称: {title_name}")
         
-        year = tmdb_info.year if (tmdb_info and tmdb_info.year) else first_info.json_object.get('Item', {}).get('ProductionYear')
+        year = tmdb_info.year if (tmdb_info and tmdb_info.year) else first_item.get('ProductionYear')
         if year and str(year) not in title_name:
             title_name += f" ({year})"
             logger.debug(f"添加年份: {year}")
@@ -908,15 +1103,14 @@ class mediaservermsgai(_PluginBase):
                 logger.debug(f"简介截断为: {self._overview_max_length}字符")
             message_texts.append(f"📖 简介：\n{overview}")
 
-        image_url = first_info.image_url
-        if not image_url and tmdb_id:
-            logger.debug("尝试获取TMDB图片")
-            image_url = self._get_tmdb_image(first_info, MediaType.TV)
+        if image_future:
+            logger.debug("等待TMDB图片")
+            image_url = image_future.result()
             if image_url:
                 logger.debug(f"获取到TMDB图片: {image_url[:50]}...")
         
         if not image_url:
-            image_url = self._webhook_images.get(first_info.channel)
+            image_url = WEBHOOK_IMAGES.get(first_info.channel)
             logger.debug(f"使用默认图片: {first_info.channel}")
         
         play_link = self._get_play_link(first_info)
@@ -924,73 +1118,71 @@ class mediaservermsgai(_PluginBase):
             logger.debug(f"生成播放链接: {play_link[:50]}...")
 
         logger.info("发送聚合消息")
-        self.post_message(
+        self._send_notification(
             mtype=NotificationType.MediaServer,
             title=message_title,
             text="\n".join(message_texts),
             image=image_url,
             link=play_link
         )
-        logger.info("聚合消息发送完成")
+        logger.info("聚合消息已加入发送队列")
 
     # === 集数合并逻辑 ===
     def _merge_continuous_episodes(self, events: List[WebhookEventInfo]) -> str:
         """合并连续剧集"""
         logger.debug("开始合并连续剧集")
-        season_episodes = {}
+        season_episodes = defaultdict(set)
         for i, event in enumerate(events):
-            season, episode = None, None
-            episode_name = ""
-            if event.json_object and isinstance(event.json_object, dict):
-                item = event.json_object.get("Item", {})
-                season = item.get("ParentIndexNumber")
-                episode = item.get("IndexNumber")
-                episode_name = item.get("Name", "")
-                logger.debug(f"剧集 {i+1}: S{season}E{episode} - {episode_name}")
+            item = self._get_item(event)
+            season = item.get("ParentIndexNumber")
+            episode = item.get("IndexNumber")
+            if item:
+                logger.debug(f"剧集 {i+1}: S{season}E{episode} - {item.get('Name', '')}")
             
             if season is None: season = getattr(event, "season_id", None)
             if episode is None: episode = getattr(event, "episode_id", None)
-            if not episode_name: episode_name = getattr(event, "item_name", "")
 
             if season is not None and episode is not None:
-                if season not in season_episodes: 
-                    season_episodes[season] = []
-                season_episodes[season].append({"episode": int(episode), "name": episode_name})
+                season_episodes[season].add(int(episode))
 
         merged_details = []
         for season in sorted(season_episodes.keys()):
-            episodes = season_episodes[season]
-            episodes.sort(key=lambda x: x["episode"])
-            if not episodes: continue
-
-            start = episodes[0]["episode"]
-            end = episodes[0]["episode"]
-            
-            for i in range(1, len(episodes)):
-                current = episodes[i]["episode"]
-                if current == end + 1:
-                    end = current
-                else:
-                    merged_details.append(f"S{str(season).zfill(2)}E{str(start).zfill(2)}-E{str(end).zfill(2)}" if start != end else f"S{str(season).zfill(2)}E{str(start).zfill(2)}")
-                    start = end = current
-            
-            merged_details.append(f"S{str(season).zfill(2)}E{str(start).zfill(2)}-E{str(end).zfill(2)}" if start != end else f"S{str(season).zfill(2)}E{str(start).zfill(2)}")
+            prefix = f"S{str(season).zfill(2)}E"
+            # 连续集数与其序号之差相同，按差值分组即得到各段连续区间
+            for _, run in groupby(enumerate(sorted(season_episodes[season])), lambda x: x[1] - x[0]):
+                run = list(run)
+                start, end = run[0][1], run[-1][1]
+                merged_details.append(f"{prefix}{start:02d}-E{end:02d}" if start != end else f"{prefix}{start:02d}")
         
         result = ", ".join(merged_details)
         logger.debug(f"剧集合并结果: {result}")
         return result
 
     def _extract_tmdb_id(self, event_info: WebhookEventInfo) -> Optional[str]:
-        """提取TMDB ID"""
-        logger.debug("开始提取TMDB ID")
-        
+        """
+        提取TMDB ID
+
+        提取结果写回 event_info.tmdb_id，同一事件的过滤、评分、媒体处理等多次调用
+        直接复用，不再重复解析 JSON 或请求媒体服务器
+        """
         tmdb_id = event_info.tmdb_id
         if tmdb_id:
             logger.debug(f"从event_info获取TMDB ID: {tmdb_id}")
             return tmdb_id
+
+        tmdb_id = self._lookup_tmdb_id(event_info)
+        if tmdb_id:
+            event_info.tmdb_id = tmdb_id
+        return tmdb_id
+
+    def _lookup_tmdb_id(self, event_info: WebhookEventInfo) -> Optional[str]:
+        """从Webhook数据、文件路径或媒体服务器API中查找TMDB ID"""
+        logger.debug("开始提取TMDB ID")
+        tmdb_id = None
+        item_data = self._get_item(event_info)
         
-        if not tmdb_id and event_info.json_object:
-            provider_ids = event_info.json_object.get('Item', {}).get('ProviderIds', {})
+        if item_data:
+            provider_ids = item_data.get('ProviderIds', {})
             tmdb_id = provider_ids.get('Tmdb')
             if tmdb_id:
                 logger.debug(f"从ProviderIds获取TMDB ID: {tmdb_id}")
@@ -998,13 +1190,12 @@ class mediaservermsgai(_PluginBase):
         
         if not tmdb_id and event_info.item_path:
             logger.debug(f"从文件路径提取: {event_info.item_path}")
-            if match := re.search(r'[\[{](?:tmdbid|tmdb)[=-](\d+)[\]}]', event_info.item_path, re.IGNORECASE):
+            if match := TMDB_ID_PATTERN.search(event_info.item_path):
                 tmdb_id = match.group(1)
                 logger.debug(f"从文件路径提取TMDB ID: {tmdb_id}")
                 return tmdb_id
 
-        if not tmdb_id and event_info.json_object:
-            item_data = event_info.json_object.get('Item', {})
+        if not tmdb_id and item_data:
             series_id = item_data.get('SeriesId')
             if series_id and item_data.get('Type') == 'Episode':
                 try:
@@ -1014,10 +1205,9 @@ class mediaservermsgai(_PluginBase):
                         host = service.config.config.get('host')
                         apikey = service.config.config.get('apikey')
                         if host and apikey:
-                            import requests
                             api_url = f"{host}/emby/Items?Ids={series_id}&Fields=ProviderIds&api_key={apikey}"
                             logger.debug(f"请求API: {api_url}")
-                            res = requests.get(api_url, timeout=5)
+                            res = HTTP_SESSION.get(api_url, timeout=5)
                             if res.status_code == 200:
                                 data = res.json()
                                 if data and data.get('Items'):
@@ -1090,37 +1280,66 @@ class mediaservermsgai(_PluginBase):
 
     def _get_tmdb_image(self, event_info: WebhookEventInfo, mtype: MediaType) -> Optional[str]:
         """获取TMDB图片"""
-        key = f"{event_info.tmdb_id}_{event_info.season_id}_{event_info.episode_id}"
-        logger.debug(f"获取TMDB图片，缓存键: {key}")
-        
-        if key in self._image_cache:
-            logger.debug(f"从缓存获取图片: {key}")
-            return self._image_cache[key]
-        
+        logger.debug(f"获取TMDB图片: {event_info.tmdb_id}_{event_info.season_id}_{event_info.episode_id}")
+        return self._fetch_tmdb_image(event_info.tmdb_id, mtype, event_info.season_id, event_info.episode_id)
+
+    @cached(
+        region="MediaServerMsgAI",
+        maxsize=512,
+        ttl=86400,
+        skip_none=True,
+        skip_empty=True
+    )
+    def _get_ip_location(self, ip: str) -> str:
+        """
+        查询IP归属地（带缓存，同一用户的登录、播放事件反复出现相同IP）
+
+        Args:
+            ip: IP地址
+
+        Returns:
+            str: 归属地
+        """
+        return WebUtils.get_location(ip)
+
+    @cached(
+        region="MediaServerMsgAI",
+        maxsize=IMAGE_CACHE_MAX_SIZE,
+        ttl=3600,
+        skip_none=True,
+        skip_empty=False
+    )
+    def _fetch_tmdb_image(self, tmdb_id: str, mtype: MediaType,
+                          season: Optional[int] = None, episode: Optional[int] = None) -> Optional[str]:
+        """
+        获取TMDB图片URL（带缓存，按 TMDB ID、媒体类型、季、集缓存，淘汰由缓存自身完成）
+
+        Args:
+            tmdb_id: TMDB ID
+            mtype: 媒体类型
+            season: 季数
+            episode: 集数
+
+        Returns:
+            str: 图片URL，优先背景图，其次海报
+        """
         try:
             logger.debug(f"请求TMDB背景图片")
             img = self.chain.obtain_specific_image(
-                mediaid=event_info.tmdb_id, mtype=mtype, 
+                mediaid=tmdb_id, mtype=mtype, 
                 image_type=MediaImageType.Backdrop, 
-                season=event_info.season_id, episode=event_info.episode_id
+                season=season, episode=episode
             )
             
             if not img:
                 logger.debug(f"请求TMDB海报图片")
                 img = self.chain.obtain_specific_image(
-                    mediaid=event_info.tmdb_id, mtype=mtype, 
+                    mediaid=tmdb_id, mtype=mtype, 
                     image_type=MediaImageType.Poster, 
-                    season=event_info.season_id, episode=event_info.episode_id
+                    season=season, episode=episode
                 )
             
             if img:
-                # 缓存管理
-                if len(self._image_cache) > self.IMAGE_CACHE_MAX_SIZE:
-                    oldest_key = next(iter(self._image_cache))
-                    logger.debug(f"清理缓存图片: {oldest_key}")
-                    self._image_cache.pop(oldest_key)
-                
-                self._image_cache[key] = img
                 logger.debug(f"获取到TMDB图片: {img[:50]}...")
                 return img
             else:
@@ -1151,7 +1370,9 @@ class mediaservermsgai(_PluginBase):
             dir_name = os.path.basename(current_dir)
             logger.debug(f"当前目录: {current_dir}, 目录名: {dir_name}")
             
-            if re.search(r'^(Season|季|S\d)', dir_name, re.IGNORECASE):
+            # 季目录：Season*（不区分大小写）、季*、S/s 加数字
+            if dir_name[:6].lower() == "season" or dir_name.startswith("季") \
+                    or (dir_name[:1] in ("S", "s") and dir_name[1:2].isdecimal()):
                 current_dir = os.path.dirname(current_dir)
                 logger.debug(f"跳过季目录，上级目录: {current_dir}")
             
@@ -1168,7 +1389,7 @@ class mediaservermsgai(_PluginBase):
             logger.error(f"从路径获取分类异常: {str(e)}")
             return ""
 
-    def _handle_music_album(self, event_info: WebhookEventInfo, item_data: dict):
+    def _handle_music_album(self, event_info: WebhookEventInfo, item_data: dict, received_time: Optional[str] = None):
         """处理音乐专辑"""
         logger.info("开始处理音乐专辑")
         try:
@@ -1192,23 +1413,23 @@ class mediaservermsgai(_PluginBase):
                 logger.warning("服务器配置不完整")
                 return
 
-            import requests
             fields = "Path,MediaStreams,Container,Size,RunTimeTicks,ImageTags,ProviderIds"
             api_url = f"{base_url}/emby/Items?ParentId={album_id}&Fields={fields}&api_key={api_key}"
             
             logger.debug(f"请求专辑歌曲列表: {api_url}")
-            res = requests.get(api_url, timeout=10)
+            res = HTTP_SESSION.get(api_url, timeout=10)
             
             if res.status_code == 200:
                 items = res.json().get('Items', [])
                 logger.info(f"专辑 [{album_name}] 包含 {len(items)} 首歌曲")
+                received_hms = (received_time or time.strftime('%Y-%m-%d %H:%M:%S'))[11:]
                 
                 for i, song in enumerate(items):
                     logger.debug(f"处理第 {i+1} 首歌曲: {song.get('Name', '未知歌曲')}")
                     self._send_single_audio_notify(
                         song, album_name, album_artist, 
                         primary_image_item_id, primary_image_tag, 
-                        base_url
+                        base_url, received_hms
                     )
             else:
                 logger.error(f"请求专辑歌曲失败，状态码: {res.status_code}")
@@ -1218,7 +1439,7 @@ class mediaservermsgai(_PluginBase):
             logger.error(traceback.format_exc())
 
     def _send_single_audio_notify(self, song: dict, album_name, album_artist, 
-                                  cover_item_id, cover_tag, base_url):
+                                  cover_item_id, cover_tag, base_url, received_hms):
         """发送单曲通知"""
         try:
             song_name = song.get('Name', '未知歌曲')
@@ -1231,7 +1452,7 @@ class mediaservermsgai(_PluginBase):
             title = f"🎵 新入库媒体：{song_name}"
             texts = []
             
-            texts.append(f"⏰ 入库：{time.strftime('%H:%M:%S', time.localtime())}")
+            texts.append(f"⏰ 入库：{received_hms}")
             texts.append(f"👤 歌手：{artist}")
             if album_name: texts.append(f"💿 专辑：{album_name}")
             texts.append(f"⏱️ 时长：{duration}")
@@ -1248,14 +1469,14 @@ class mediaservermsgai(_PluginBase):
                 logger.debug(f"生成播放链接")
 
             logger.info(f"发送单曲通知: {song_name}")
-            self.post_message(
+            self._send_notification(
                 mtype=NotificationType.MediaServer,
                 title=title,
                 text="\n" + "\n".join(texts),
                 image=image_url,
                 link=link
             )
-            logger.debug(f"单曲通知发送完成")
+            logger.debug(f"单曲通知已加入发送队列")
             
         except Exception as e:
             logger.error(f"发送单曲通知失败: {str(e)}")
@@ -1309,7 +1530,7 @@ class mediaservermsgai(_PluginBase):
             if not codes: 
                 return ""
             
-            cn_names = [self._country_cn_map.get(code.upper(), code) for code in codes]
+            cn_names = [COUNTRY_CN_MAP.get(code.upper(), code) for code in codes]
             result = "、".join(cn_names)
             logger.debug(f"地区中文名: {result}")
             return result
@@ -1350,7 +1571,7 @@ class mediaservermsgai(_PluginBase):
             logger.debug(f"季集信息: {info}")
         elif description := event_info.json_object.get('Description'):
             first_line = description.split('\n\n')[0].strip()
-            if re.search(r'S\d+\s+E\d+', first_line):
+            if SEASON_EPISODE_PATTERN.search(first_line):
                  texts.append(f"📺 季集：{first_line}")
                  logger.debug(f"从描述提取季集: {first_line}")
 
@@ -1371,7 +1592,7 @@ class mediaservermsgai(_PluginBase):
         
         if event_info.ip: 
             try:
-                location = WebUtils.get_location(event_info.ip)
+                location = self._get_ip_location(event_info.ip)
                 extras.append(f"🌐 IP：{event_info.ip} ({location})")
                 logger.debug(f"IP信息: {event_info.ip} ({location})")
             except Exception as e:
@@ -1427,27 +1648,115 @@ class mediaservermsgai(_PluginBase):
     def _add_key_cache(self, key):
         """添加元素到过期字典中"""
         logger.debug(f"添加缓存键: {key}")
-        self._webhook_msg_keys[key] = time.time() + self.DEFAULT_EXPIRATION_TIME
-        logger.debug(f"当前缓存数量: {len(self._webhook_msg_keys)}")
+        with self._lock:
+            expire_at = time.monotonic() + self.DEFAULT_EXPIRATION_TIME
+            self._webhook_msg_keys[key] = expire_at
+            heapq.heappush(self._expiry_heap, (expire_at, key))
+            logger.debug(f"当前缓存数量: {len(self._webhook_msg_keys)}")
 
     def _remove_key_cache(self, key):
         """从过期字典中移除指定元素"""
-        if key in self._webhook_msg_keys: 
-            del self._webhook_msg_keys[key]
-            logger.debug(f"移除缓存键: {key}")
-            logger.debug(f"当前缓存数量: {len(self._webhook_msg_keys)}")
+        with self._lock:
+            if self._webhook_msg_keys.pop(key, None) is not None:
+                logger.debug(f"移除缓存键: {key}")
+                logger.debug(f"当前缓存数量: {len(self._webhook_msg_keys)}")
 
     def _clean_expired_cache(self):
         """清理过期的缓存元素"""
-        current_time = time.time()
-        expired_keys = [k for k, v in self._webhook_msg_keys.items() if v <= current_time]
+        expired_count = 0
+        # Webhook 在多个线程中并发处理，查看堆顶与弹出必须在同一把锁内完成，否则可能弹出未到期的条目
+        with self._lock:
+            current_time = time.monotonic()
+            # 只弹出已到期的堆条目；键被重新添加或移除过的旧条目直接丢弃
+            while self._expiry_heap and self._expiry_heap[0][0] <= current_time:
+                expire_at, key = heapq.heappop(self._expiry_heap)
+                if self._webhook_msg_keys.get(key) == expire_at:
+                    self._webhook_msg_keys.pop(key, None)
+                    expired_count += 1
         
-        if expired_keys:
-            logger.debug(f"清理 {len(expired_keys)} 个过期缓存")
-            for key in expired_keys:
-                self._webhook_msg_keys.pop(key, None)
+        if expired_count:
+            logger.debug(f"清理 {expired_count} 个过期缓存")
             logger.debug(f"清理后缓存数量: {len(self._webhook_msg_keys)}")
 
+    def _recognize_media(self, tmdb_id: str, mtype: MediaType):
+        """
+        识别TMDB媒体信息（优先读取持久化缓存）
+
+        命中缓存时立即返回，超过 TMDB_META_TTL 的旧数据照常返回并提交后台刷新；
+        未命中时同步识别并写入缓存
+
+        Args:
+            tmdb_id: TMDB ID
+            mtype: 媒体类型
+
+        Returns:
+            MediaInfo: 识别结果，失败返回None
+        """
+        tmdb_id = int(tmdb_id)
+        if not self._meta_db:
+            return self.chain.recognize_media(tmdbid=tmdb_id, mtype=mtype)
+
+        row = None
+        try:
+            with self._meta_lock:
+                row = self._meta_db.execute(
+                    "SELECT payload, synced_at FROM tmdb_meta WHERE tmdb_id = ? AND mtype = ?",
+                    (tmdb_id, mtype.value)
+                ).fetchone()
+        except Exception as e:
+            logger.debug(f"读取TMDB元数据缓存异常: {str(e)}")
+
+        if row:
+            try:
+                tmdb_info = pickle.loads(row[0])
+            except Exception as e:
+                logger.debug(f"TMDB元数据缓存无法解析，重新识别: {str(e)}")
+            else:
+                logger.debug(f"TMDB元数据缓存命中: {tmdb_id}")
+                if time.time() - row[1] > self.TMDB_META_TTL:
+                    self._submit_meta_refresh(tmdb_id, mtype)
+                return tmdb_info
+
+        return self._refresh_meta(tmdb_id, mtype)
+
+    def _submit_meta_refresh(self, tmdb_id: int, mtype: MediaType):
+        """提交TMDB元数据后台刷新，同一键只保留一个刷新任务"""
+        key = (tmdb_id, mtype.value)
+        with self._meta_lock:
+            if key in self._meta_refreshing or not self._meta_executor:
+                return
+            self._meta_refreshing.add(key)
+        logger.debug(f"TMDB元数据缓存已过期，后台刷新: {tmdb_id}")
+        try:
+            self._meta_executor.submit(self._refresh_meta, tmdb_id, mtype)
+        except RuntimeError:
+            # 线程池已关闭
+            with self._meta_lock:
+                self._meta_refreshing.discard(key)
+
+    def _refresh_meta(self, tmdb_id: int, mtype: MediaType):
+        """从TMDB识别媒体信息并写入持久化缓存"""
+        key = (tmdb_id, mtype.value)
+        try:
+            tmdb_info = self.chain.recognize_media(tmdbid=tmdb_id, mtype=mtype)
+            if tmdb_info:
+                payload = pickle.dumps(tmdb_info)
+                with self._meta_lock:
+                    if self._meta_db:
+                        self._meta_db.execute(
+                            "INSERT OR REPLACE INTO tmdb_meta (tmdb_id, mtype, payload, synced_at) VALUES (?, ?, ?, ?)",
+                            (tmdb_id, mtype.value, payload, int(time.time()))
+                        )
+                        self._meta_db.commit()
+                        logger.debug(f"TMDB元数据已写入缓存: {tmdb_id}")
+            return tmdb_info
+        except Exception as e:
+            logger.error(f"刷新TMDB元数据异常: {str(e)}")
+            return None
+        finally:
+            with self._meta_lock:
+                self._meta_refreshing.discard(key)
+
     @cached(
         region="MediaServerMsgAI",
         maxsize=128,
@@ -1494,12 +1803,24 @@ class mediaservermsgai(_PluginBase):
         退出插件时的清理工作
 
         确保：
-        1. 所有待处理的聚合消息被立即发送
-        2. 所有定时器被取消
+        1. 聚合调度线程停止
+        2. 所有待处理的聚合消息被立即发送
         3. 清空所有内部缓存数据
         """
         logger.info("插件停止，开始清理工作")
         try:
+            # 停止聚合调度线程，避免与下面的立即发送重复
+            with self._sched_cv:
+                scheduled_count = len(self._sched_deadline)
+                self._sched_stop = True
+                self._sched_heap.clear()
+                self._sched_deadline.clear()
+                self._sched_cv.notify_all()
+            if scheduled_count > 0:
+                logger.info(f"取消 {scheduled_count} 个聚合调度")
+            else:
+                logger.debug("无待调度的聚合")
+
             # 发送所有待处理的聚合消息
             pending_count = len(self._pending_messages)
             if pending_count > 0:
@@ -1513,32 +1834,53 @@ class mediaservermsgai(_PluginBase):
             else:
                 logger.debug("无待处理的聚合消息")
             
-            # 取消所有定时器
-            timer_count = len(self._aggregate_timers)
-            if timer_count > 0:
-                logger.info(f"取消 {timer_count} 个定时器")
-                for timer in self._aggregate_timers.values():
-                    try:
-                        timer.cancel()
-                        logger.debug("定时器取消成功")
-                    except Exception as e:
-                        logger.debug(f"取消定时器时出错: {str(e)}")
-            else:
-                logger.debug("无活跃定时器")
-            
             # 清理缓存数据
             logger.info("清理缓存数据")
-            self._aggregate_timers.clear()
             self._pending_messages.clear()
-            self._webhook_msg_keys.clear()
-            self._image_cache.clear()
+            with self._lock:
+                self._webhook_msg_keys.clear()
+                self._expiry_heap.clear()
+            self._service_info_cache.clear()
             
             # 清理TMDB缓存
             try:
                 self._get_tmdb_info.cache_clear()
+                self._fetch_tmdb_image.cache_clear()
+                self._get_ip_location.cache_clear()
                 logger.debug("TMDB缓存清理完成")
             except Exception as e:
                 logger.debug(f"清理TMDB缓存时出错: {str(e)}")
+
+            # 等待发送队列中的通知发送完毕后停止发送线程，最多等待 30 秒
+            with self._send_lock:
+                send_thread, send_queue = self._send_thread, self._send_queue
+                self._send_stop = True
+            if send_thread:
+                logger.info(f"等待 {send_queue.qsize()} 条通知发送完成")
+                deadline = time.monotonic() + 30
+                try:
+                    send_queue.put(None, timeout=30)
+                    send_thread.join(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Full:
+                    logger.warning("通知发送队列已满，无法通知发送线程退出")
+                if send_thread.is_alive():
+                    # 不清除线程引用：线程仍在消费队列，重新启用时继续使用，避免出现两个发送线程
+                    logger.warning(f"通知发送线程未在 30 秒内退出，剩余 {send_queue.qsize()} 条通知")
+
+            # 关闭并行请求线程池
+            if self._io_executor:
+                self._io_executor.shutdown(wait=False)
+                self._io_executor = None
+
+            # 关闭TMDB元数据持久化缓存
+            if self._meta_executor:
+                self._meta_executor.shutdown(wait=False)
+                self._meta_executor = None
+            if self._meta_db:
+                with self._meta_lock:
+                    self._meta_db.close()
+                    self._meta_db = None
+                logger.debug("TMDB元数据缓存已关闭")
             
             logger.info("插件清理完成")
             